@@ -1,29 +1,43 @@
 #this file is app.py
-from flask import Flask, render_template, jsonify, request, session, url_for, redirect
-from src.helper import download_huggingface_embeddings, load_medical_disease_data
+from flask import Flask, render_template, jsonify, request, session, url_for, redirect, Response, stream_with_context
+from src.helper import download_huggingface_embeddings
+from src.analysis import analyze_symptoms, find_matching_disease
+from src.snapshot import knowledge
+from src.deadline import Deadline, current_deadline, stage_budget_ms, STREAM_DEADLINE_MS
+from src.inference_client import PooledInferenceClient, CircuitOpenError, HF_MODEL, HF_READ_TIMEOUT_S
+from src.message import parse_message, ScannedText
+from src.batch import read_intake, iter_triage, make_batch_pool
+from src.knowbase import load_knowbase, KNOWBASE_DIR
+from src.vector_index import LocalVectorStore
+from src.lexical_index import load_lexical_index
+from src.retriever import HybridRetriever
+from src.query_embedder import QueryEmbedder
+from src.answer_cache import SemanticAnswerCache
 from langchain_pinecone import PineconeVectorStore
 from dotenv import load_dotenv
 from tqdm.auto import tqdm
 import time
+import asyncio
 from langchain.chains import create_retrieval_chain
 from langchain.chains.combine_documents import create_stuff_documents_chain
 from langchain_core.prompts import ChatPromptTemplate
 from langchain.llms.base import LLM
+from langchain_core.outputs import GenerationChunk
 from src.prompt import system_prompt, enhance_response
 import os
-from store_index import text_chunks
 from transformers import pipeline 
 import logging
 from typing import Dict, Any, Optional, List
 from googletrans import Translator
 from datetime import timedelta
 from collections import deque
-from huggingface_hub import InferenceClient
+from huggingface_hub import AsyncInferenceClient
 import torch
 from transformers import AutoTokenizer, AutoModelForCausalLM
 from langchain.prompts import PromptTemplate
 import wave
 import io
+import json
 import base64
 from datetime import datetime
 import speech_recognition as sr
@@ -49,9 +63,10 @@ HUGGINGFACE_API_TOKEN = os.environ.get("HUGGINGFACE_API_TOKEN")
 os.environ["PINECONE_API_KEY"] = PINECONE_API_KEY
 os.environ["HUGGINGFACE_API_TOKEN"] = HUGGINGFACE_API_TOKEN
 
-embeddings = download_huggingface_embeddings()
+# Query-side embeddings: LRU cache + micro-batching over the raw model. The
+# on-disk chunk cache is for ingestion only, user questions are never persisted.
+embeddings = QueryEmbedder(download_huggingface_embeddings(cache_dir=None))
 index_name = "medicalbot"
-medical_disease_data = load_medical_disease_data()
 conversation_memory = {}
 MAX_HISTORY = 4
 
@@ -71,305 +86,44 @@ LANGUAGE_MAP = {
 
 SUPPORTED_TRANSLATION_LANGS = ['en', 'zu', 'xh', 'af', 'st', 'tn']
 
-# Initialize Pinecone
+# VECTOR_BACKEND=local serves retrieval from the in-process index over the
+# knowledge base artifact; otherwise Pinecone is used with the local index as
+# fallback when it is unreachable.
+VECTOR_BACKEND = os.environ.get("VECTOR_BACKEND", "pinecone")
+
+knowbase = load_knowbase(KNOWBASE_DIR)
+docsearch = None
+
 try:
+    if VECTOR_BACKEND == "local":
+        raise RuntimeError("VECTOR_BACKEND=local")
     docsearch = PineconeVectorStore.from_existing_index(
         index_name=index_name,
         embedding=embeddings
     )
     print(f"✓ Successfully connected to Pinecone index '{index_name}'")
     
-    retriever = docsearch.as_retriever(search_type="similarity", search_kwargs={"k": 3})
-    
 except Exception as e:
-    print(f"✗ Pinecone error: {str(e)}")
-    print("Creating local FAISS store as fallback...")
-    from langchain_community.vectorstores import FAISS
-    
-    # Create fallback FAISS store
-    if os.path.exists("full_medical_knowbase"):
-        docsearch = FAISS.load_local("full_medical_knowbase", embeddings)
-    else:
-        docsearch = FAISS.from_documents(text_chunks, embeddings)
-        docsearch.save_local("full_medical_knowbase")
-    
-    retriever = docsearch.as_retriever(search_type="similarity", search_kwargs={"k": 3})
-
-def find_matching_disease(user_input: str) -> Optional[Dict[str, Any]]:
-    """Find matching disease using improved matching logic."""
-    user_input = user_input.lower()
-    
-    for name, data in medical_disease_data.items():
-        if name.lower() in user_input:
-            return data
-    
-    for name, data in medical_disease_data.items():
-        if name.lower().replace(" ", "") in user_input.replace(" ", ""):
-            return data
-    
-    symptom_counts = {}
-    for name, data in medical_disease_data.items():
-        for symptom in data.get('symptoms', []):
-            if symptom.lower() in user_input:
-                symptom_counts[name] = symptom_counts.get(name, 0) + 1
-    
-    if symptom_counts:
-        best_match = max(symptom_counts.items(), key=lambda x: x[1])
-        if best_match[1] >= 2: 
-            return medical_disease_data[best_match[0]]
-    
-    return None
-
-def analyze_symptoms(user_input: str, lang: str = "en", input_method: str = "text") -> Dict:
-    """Enhanced symptom analysis with better pattern matching"""
-    context = {
-        'symptoms': [],
-        'locations': [],
-        'activities': [],
-        'contacts': [],
-        'timeframe': None,
-        'severity': None
-    }
-    
-    input_lower = user_input.lower()
-    
-    symptom_keywords = {
-        'fever': ['fever', 'temperature', 'hot', 'burning up'],
-        'headache': ['headache', 'head hurts', 'head pain', 'head aching'],
-        'muscle pain': ['muscle', 'body ache', 'muscles aching', 'body pain'],
-        'fatigue': ['tired', 'weak', 'exhausted', 'fatigue', 'no energy'],
-        'rash': ['rash', 'spots', 'skin marks', 'bumps'],
-        'cough': ['cough', 'coughing'],
-        'sore throat': ['throat', 'swallow hurts'],
-        'diarrhea': ['diarrhea', 'loose stool', 'stomach runs'],
-        'nausea': ['nausea', 'feel sick', 'vomit', 'throw up'],
-        'abdominal pain': ['stomach pain', 'belly ache', 'abdominal pain'],
-        'chills': ['chills', 'shivering', 'cold'],
-        'sweating': ['sweat', 'sweating', 'night sweats'],
-        'shortness of breath': ['shortness of breath', 'breathless', 'difficulty breathing'],
-        'chest pain': ['chest pain', 'chest hurts', 'pain in chest'],
-        'dizziness': ['dizzy', 'lightheaded', 'faint'],
-        'bleeding': ['bleeding', 'blood', 'bleed'],
-        'itching': ['itchy', 'itching', 'scratchy'],
-        'swelling': ['swelling', 'swollen', 'puffy'],
-        'weight loss': ['weight loss', 'losing weight', 'lost weight', 'unexplained weight loss', 'losing weight without trying'],
-        'night sweats': ['night sweats', 'sweat at night'],
-        'confusion': ['confused', 'confusion', 'disoriented'],
-        'seizures': ['seizures', 'convulsions', 'fits'],
-        'loss of consciousness': ['unconscious', 'passed out', 'blackout'],
-        'joint pain': ['joint pain', 'joints hurting', 'joint aches'],
-        'stiffness': ['stiff', 'stiffness', 'hard to move'],
-        'numbness': ['numb', 'numbness', 'no feeling'],
-        'vision changes': ['vision changes', 'blurred vision', 'double vision'],
-        'hearing loss': ['hearing loss', 'deaf', 'hard of hearing'],
-        'ear pain': ['ear pain', 'earache', 'ear hurts'],
-        'toothache': ['toothache', 'tooth pain', 'tooth hurts'],
-        'back pain': ['back pain', 'back hurts', 'backache'],
-        'leg pain': ['leg pain', 'leg hurts', 'legache'],
-        'swollen lymph nodes': ['swollen lymph nodes', 'swollen glands', 'lumps in neck', 'lumps in armpit'],
-        'loss of appetite': ['loss of appetite', 'not hungry', 'no appetite'],
-        'coughing blood': ['coughing blood', 'blood in cough', 'coughing up blood'],
-        'persistent cough': ['persistent cough', 'long cough', 'cough lasting'],
-        'night sweats': ['night sweats', 'sweating at night'],
-        'unexplained weight loss': ['unexplained weight loss', 'losing weight without trying'],
-        'body aches': ['body aches', 'body pain', 'aches all over'],
-        'chest tightness': ['chest tightness', 'tight chest', 'chest feels tight'],
-        'wheezing': ['wheezing', 'whistling sound when breathing', 'wheeze'],
-        'loss of smell': ['loss of smell', 'cant smell', 'no sense of smell'],
-        'loss of taste': ['loss of taste', 'cant taste', 'no sense of taste'],
-        'runny nose': ['runny nose', 'nose is runny', 'nasal discharge'],
-        'sneezing': ['sneezing', 'sneeze', 'sneezes'],
-        'fever with chills': ['hot and cold', 'shivering fever', 'fever with shaking'],
-        'jaundice': ['yellow eyes', 'yellow skin', 'jaundice'],
-        'bloody diarrhea': ['bloody diarrhea', 'blood in stool', 'bloody stool'],
-        'persistent vomiting': ['persistent vomiting', 'vomiting a lot', 'throwing up a lot'],
-    }
-    
-    for symptom, keywords in symptom_keywords.items():
-        if any(kw in input_lower for kw in keywords):
-            context['symptoms'].append(symptom)
-    
-    locations = ["durban", "johannesburg", "cape town", "pretoria", "limpopo", 
-                "mpumalanga", "kwazulu-natal", "mozambique", "zimbabwe", "botswana",
-                "malawi", "tanzania", "kenya", "uganda", "angola", "namibia",
-                "zambia", "congo", "ethiopia", "sudan", "south sudan"]
-    for loc in locations:
-        if loc in input_lower:
-            context['locations'].append(loc)
-    
-    activity_patterns = {
-        'sexual': ['unprotected sex', 'had sex', 'sexual', 'intercourse', 'sexually active', ],
-        'travel': ['travel', 'trip', 'vacation', 'went to', 'visited', 'travelled', 'traveling', 'traveled', 'travelling'],
-        'food': ['ate', 'eating', 'food', 'meal', 'drank', 'water', 'restaurant', 'dining'],
-        'mosquito': ['mosquito', 'bitten', 'bugs', 'insects', 'bug bites', 'mosquitoes'],
-        'contact': ['contact with', 'exposed to', 'around someone with', 'someone who has', 'cared for someone with'],
-        'animal': ['animal', 'pet', 'dog', 'cat', 'cattle', 'livestock', 'wildlife'],
-        'hospital': ['hospital', 'clinic', 'healthcare', 'medical facility', 'doctor', 'nurse'],
-        'crowded': ['crowded', 'large gathering', 'party', 'event', 'crowd', 'public transport'],
-        'water': ['swam', 'swimming', 'water', 'lake', 'river', 'pool', 'beach'],
-        'hiking': ['hiking', 'camping', 'outdoors', 'trekking', 'nature', 'bush'],
-        'farming': ['farming', 'farm', 'agriculture', 'crops', 'field work'],
-        'construction': ['construction', 'building site', 'worksite', 'dusty', 'debris'],
-        'mining': ['mining', 'mine', 'underground', 'miner', 'shaft'],
-        'healthcare': ['healthcare worker', 'nurse', 'doctor', 'hospital staff', 'clinic worker'],
-        'prison': ['prison', 'jail', 'inmate', 'correctional facility', 'detention center'],
-        'school': ['school', 'classroom', 'student', 'teacher', 'university', 'college'],
-        'military': ['military', 'soldier', 'army', 'navy', 'air force', 'base'],
-        'refugee': ['refugee', 'displaced', 'camp', 'asylum seeker', 'migrant'],
-        'homeless': ['homeless', 'shelter', 'street', 'living rough', 'no fixed address'],
-        'elderly': ['elderly', 'senior', 'old age', 'retirement home', 'nursing home'],
-        'childcare': ['childcare', 'daycare', 'nursery', 'preschool', 'kindergarten'],
-    }
-    
-    for activity_type, patterns in activity_patterns.items():
-        if any(p in input_lower for p in patterns):
-            context['activities'].append(activity_type)
-    
-    possible_conditions = []
-    
-    for disease_name, disease_data in medical_disease_data.items():
-        score = 0
-        matched_symptoms = []
-        matched_factors = []
-        
-        for symptom in context['symptoms']:
-            if symptom in str(disease_data.get('symptoms', [])).lower():
-                score += 3
-                matched_symptoms.append(symptom)
-        
-        how_contracted = str(disease_data.get('how_contracted', [])).lower()
-        if 'sexual' in context['activities'] and 'sexual' in how_contracted:
-            score += 5
-            matched_factors.append('sexual transmission')
-        
-        if 'travel' in context['activities']:
-            high_risk_areas = str(disease_data.get('high_risk_areas', [])).lower()
-            for loc in context['locations']:
-                if loc in high_risk_areas:
-                    score += 4
-                    matched_factors.append(f'endemic in {loc}')
-        
-        if score > 0:
-            confidence = min(score / 10, 1.0)
-            
-            possible_conditions.append({
-                'disease': disease_name,
-                'confidence': confidence,
-                'score': score,
-                'matched_symptoms': matched_symptoms,
-                'matched_factors': matched_factors,
-                'description': disease_data.get('description', ''),
-                'treatment': disease_data.get('treatment', [])
-            })
-    
-    possible_conditions.sort(key=lambda x: x['confidence'], reverse=True)
-    
-    urgency = 'low'
-    urgent_symptoms = ['chest pain', 'difficulty breathing', 'severe bleeding', 'unconscious']
-    if any(s in input_lower for s in urgent_symptoms):
-        urgency = 'high'
-    elif len(context['symptoms']) >= 3 or 'fever' in context['symptoms']:
-        urgency = 'moderate'
-    
-    result = {
-        'context': context,
-        'possible_conditions': possible_conditions[:5],
-        'urgency': urgency,
-        'risk_factors': {
-            'travel': 'travel' in context['activities'],
-            'sexual': 'sexual' in context['activities']
-        }
-    }
-    
-    result = enhance_ai_reasoning(result, input_method)
-    
-    return result
+    print(f"✗ Pinecone unavailable: {str(e)}")
+    print("Using local knowledge base index...")
+    
+    # The artifact already holds the vectors, so nothing is re-embedded here.
+    # Rebuild it with `python store_index.py` when the PDFs change.
+    if knowbase is not None:
+        docsearch = LocalVectorStore(knowbase, embeddings)
+        print(f"✓ Local index ready with {len(docsearch.index)} chunks")
 
-def enhance_ai_reasoning(analysis: dict, input_method: str = "text") -> dict:
-    """Enhanced multi-modal reasoning for better diagnosis"""
-    
-    confidence_boost = {
-        'voice': 1.1,
-        'body_map': 1.2,
-        'text': 1.0
-    }
-    
-    if input_method == 'body_map':
-        for condition in analysis['possible_conditions']:
-            condition['confidence'] *= confidence_boost[input_method]
-            condition['precision'] = 'high'
-    
-    symptom_combinations = {
-        ('fever', 'headache', 'muscle pain'): ['malaria', 'dengue', 'flu', 'covid-19'],
-        ('chest pain', 'shortness of breath'): ['heart attack', 'pneumonia', 'pulmonary embolism'],
-        ('abdominal pain', 'vomiting', 'fever'): ['appendicitis', 'food poisoning', 'gastroenteritis'],
-        ('fever', 'rash', 'headache'): ['meningitis', 'measles', 'dengue'],
-        ('cough', 'fever', 'shortness of breath'): ['tuberculosis', 'pneumonia', 'covid-19'],
-        ('fever', 'joint pain', 'rash'): ['dengue', 'chikungunya', 'rheumatic fever'],
-        ('weight loss', 'night sweats', 'cough'): ['tuberculosis', 'hiv', 'cancer'],
-        ('fever', 'headache', 'stiff neck'): ['meningitis', 'encephalitis'],
-        ('abdominal pain', 'fever', 'jaundice'): ['hepatitis', 'gallstones', 'pancreatitis'],
-        ('chest pain', 'sweating', 'nausea'): ['heart attack', 'angina', 'acid reflux']
-    }
-    
-    current_symptoms = tuple(sorted(analysis['context']['symptoms']))
-    for combo, conditions in symptom_combinations.items():
-        if all(s in current_symptoms for s in combo):
-            for cond in analysis['possible_conditions']:
-                if any(c in cond['disease'].lower() for c in conditions):
-                    cond['confidence'] = min(cond['confidence'] * 1.3, 0.95)
-                    cond['pattern_match'] = True
-                    cond['symptom_pattern'] = ', '.join(combo)
-    
-    sa_specific_patterns = {
-        ('fever', 'chills', 'sweating'): ['malaria'],
-        ('cough', 'weight loss', 'night sweats'): ['tuberculosis'],
-        ('fever', 'rash', 'joint pain'): ['dengue', 'chikungunya'],
-        ('fever', 'headache', 'muscle pain', 'travel_history'): ['malaria', 'dengue']
-    }
-    
-    if 'locations' in analysis['context']:
-        for loc in analysis['context']['locations']:
-            if any(area in loc.lower() for area in ['limpopo', 'mpumalanga', 'kzn', 'kwazulu']):
-                for cond in analysis['possible_conditions']:
-                    if 'malaria' in cond['disease'].lower():
-                        cond['confidence'] = min(cond['confidence'] * 1.4, 0.95)
-                        cond['geographic_risk'] = 'high'
-    
-    analysis['reasoning'] = generate_diagnostic_reasoning(analysis)
-    
-    return analysis
+# BM25 over the same chunks, fused with the vector scores; it also answers on
+# its own while the vector backend is slow or down
+lexical_index = load_lexical_index(knowbase) if knowbase is not None else None
 
-def generate_diagnostic_reasoning(analysis: dict) -> str:
-    """Generate explanation of diagnostic reasoning"""
-    
-    reasoning = []
-    
-    if analysis['possible_conditions']:
-        top = analysis['possible_conditions'][0]
-        
-        if top['confidence'] > 0.7:
-            reasoning.append(f"High confidence for {top['disease']} due to:")
-        else:
-            reasoning.append(f"Considering {top['disease']} because:")
-        
-        if top.get('matched_symptoms'):
-            reasoning.append(f"matching symptoms: {', '.join(top['matched_symptoms'])}")
-        
-        if top.get('pattern_match'):
-            reasoning.append("classic symptom pattern")
-        
-        if top.get('geographic_risk'):
-            reasoning.append("high geographic risk area")
-        
-        if analysis['urgency'] == 'high':
-            reasoning.append("⚠️ URGENT: immediate care recommended")
-        elif analysis['urgency'] == 'moderate':
-            reasoning.append("⚠️ Important: clinic visit within 24 hours")
-    
-    reasoning.append("Based on South African clinical guidelines")
-    
-    return ". ".join(reasoning)
+if lexical_index is not None:
+    retriever = HybridRetriever(vectorstore=docsearch, lexical=lexical_index, knowbase=knowbase, k=3)
+    print("✓ Hybrid BM25 + vector retrieval enabled")
+elif docsearch is not None:
+    retriever = docsearch.as_retriever(search_type="similarity", search_kwargs={"k": 3})
+else:
+    retriever = None
 
 def generate_follow_up_questions(symptoms: list, risk_factors: dict, context: dict = None) -> list:
     """Generate intelligent follow-up questions based on medical analysis"""
@@ -433,6 +187,8 @@ def transcribe_audio_free(audio_data):
 
 def summarize_conversation(messages: list) -> dict:
     """Summarize medical conversation and extract key points"""
+    # Stored entries already carry their hits; only plain strings are scanned here
+    messages = [ScannedText.of(msg) for msg in messages]
     
     all_symptoms = set()
     medications_mentioned = []
@@ -440,30 +196,10 @@ def summarize_conversation(messages: list) -> dict:
     recommendations = []
     
     for msg in messages:
-        msg_lower = msg.lower()
-        
-        symptom_keywords = ['fever', 'headache', 'cough', 'pain', 'fatigue', 'nausea', 
-                          'vomiting', 'diarrhea', 'rash', 'weakness', 'dizziness', 'chills',
-                          'sweating', 'sore throat', 'runny nose', 'body ache', 'muscle pain',
-                          'abdominal pain', 'shortness of breath', 'chest pain', 'bleeding',
-                          'swelling', 'itching', 'redness', 'loss of appetite', 'weight loss',
-                          'night sweats', 'confusion', 'seizures', 'loss of consciousness',
-                          'joint pain', 'stiffness', 'numbness', 'tingling', 'vision changes',
-                          'hearing loss', 'ear pain', 'toothache', 'back pain', 'leg pain']
-        for symptom in symptom_keywords:
-            if symptom in msg_lower:
-                all_symptoms.add(symptom)
-        
-        med_keywords = ['paracetamol', 'ibuprofen', 'antibiotic', 'aspirin', 'insulin']
-        for med in med_keywords:
-            if med in msg_lower:
-                medications_mentioned.append(med)
-        
-        diagnostic_terms = ['test', 'x-ray', 'blood test', 'scan', 'examination',
-                            'diagnosis', 'diagnose', 'lab results']
-        for term in diagnostic_terms:
-            if term in msg_lower:
-                diagnoses_discussed.append(term)
+        hits = msg.hits
+        all_symptoms.update(hits['summary_symptom'])
+        medications_mentioned.extend(hits['medication'])
+        diagnoses_discussed.extend(hits['diagnostic'])
     
     summary = {
         'timestamp': datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
@@ -476,9 +212,9 @@ def summarize_conversation(messages: list) -> dict:
     }
     
     for i, msg in enumerate(messages):
-        if 'urgent' in msg.lower() or 'emergency' in msg.lower():
+        if msg.hits['urgent_mention']:
             summary['key_points'].append(f"Urgent care mentioned at message {i+1}")
-        if 'follow up' in msg.lower() or 'follow-up' in msg.lower():
+        if msg.hits['follow_up']:
             summary['key_points'].append(f"Follow-up care discussed at message {i+1}")
     
     if 'fever' in all_symptoms and 'headache' in all_symptoms:
@@ -490,14 +226,25 @@ def summarize_conversation(messages: list) -> dict:
     
     return summary
 
+URGENCY_BANNERS = {
+    'high': "🚨 **URGENT**: These symptoms require immediate medical attention. Go to the nearest hospital or call 10177.",
+    'moderate': "⚠️ **IMPORTANT**: Please visit a clinic within 24 hours for proper evaluation and testing.",
+    'low': "💡 **RECOMMENDATION**: Schedule a clinic visit soon, especially if symptoms persist or worsen.",
+}
+
+def acknowledgement(symptoms) -> Optional[str]:
+    if symptoms:
+        return f"I understand you're experiencing {', '.join(symptoms)}. Let me help analyze what this might indicate."
+    return None
+
 def format_medical_response(analysis: dict, user_input: str) -> str:
     """Format comprehensive medical response with South African context"""
     
     response_parts = []
     
-    symptoms = analysis['context']['symptoms']
-    if symptoms:
-        response_parts.append(f"I understand you're experiencing {', '.join(symptoms)}. Let me help analyze what this might indicate.\n")
+    ack = acknowledgement(analysis['context']['symptoms'])
+    if ack:
+        response_parts.append(f"{ack}\n")
     
     if analysis.get('reasoning'):
         response_parts.append(f"**Clinical Reasoning:** {analysis['reasoning']}\n")
@@ -525,13 +272,7 @@ def format_medical_response(analysis: dict, user_input: str) -> str:
     
     urgency = analysis.get('urgency', 'low')
     response_parts.append("\n")
-    
-    if urgency == 'high':
-        response_parts.append("🚨 **URGENT**: These symptoms require immediate medical attention. Go to the nearest hospital or call 10177.")
-    elif urgency == 'moderate':
-        response_parts.append("⚠️ **IMPORTANT**: Please visit a clinic within 24 hours for proper evaluation and testing.")
-    else:
-        response_parts.append("💡 **RECOMMENDATION**: Schedule a clinic visit soon, especially if symptoms persist or worsen.")
+    response_parts.append(URGENCY_BANNERS.get(urgency, URGENCY_BANNERS['low']))
     
     response_parts.append("\n\n---\n*This is preliminary guidance only. Please see a healthcare professional for proper diagnosis and treatment.*")
     
@@ -582,6 +323,10 @@ def translate_text(text, target_lang='en'):
     if target_lang == 'en':
         return text
     
+    deadline = current_deadline()
+    if deadline is not None and not deadline.allows('translation'):
+        return text
+    
     try:
         translator = Translator(to_lang=target_lang)
         translated = translator.translate(text)
@@ -618,23 +363,33 @@ class SimpleMedicalLLM:
         return self.invoke({'input': prompt})
 
 try:
-    client = InferenceClient(
-        model="microsoft/BioGPT",
-        token=os.getenv("HUGGINGFACE_API_TOKEN")
+    # Pooled session with timeouts and a circuit breaker (src/inference_client.py)
+    client = PooledInferenceClient(token=os.getenv("HUGGINGFACE_API_TOKEN"))
+    # Same endpoint for the asyncio serving path (asgi.py); shares client.breaker
+    async_client = AsyncInferenceClient(
+        model=HF_MODEL,
+        token=os.getenv("HUGGINGFACE_API_TOKEN"),
+        timeout=HF_READ_TIMEOUT_S
     )
     
     class HFWrapper(LLM):
         client: Any
+        async_client: Any = None
         
-        def __init__(self, client):
+        def __init__(self, client, async_client=None):
             super().__init__()
             self.client = client
+            self.async_client = async_client
         
         @property
         def _llm_type(self) -> str:
             return "huggingface"
         
         def _call(self, prompt: str, stop: Optional[List[str]] = None) -> str:
+            # Not worth starting a remote generation the request cannot wait for
+            deadline = current_deadline()
+            if deadline is not None and not deadline.allows('generation'):
+                return SimpleMedicalLLM().invoke({'input': prompt})
             try:
                 response = self.client.text_generation(
                     prompt,
@@ -642,18 +397,79 @@ try:
                     temperature=0.7
                 )
                 return response
+            except CircuitOpenError:
+                return SimpleMedicalLLM().invoke({'input': prompt})
+            except Exception as e:
+                print(f"Hugging Face API error: {e}")
+                return SimpleMedicalLLM().invoke({'input': prompt})
+        
+        async def _acall(self, prompt: str, stop: Optional[List[str]] = None) -> str:
+            if self.async_client is None:
+                return await super()._acall(prompt, stop=stop)
+            deadline = current_deadline()
+            if deadline is not None and not deadline.allows('generation'):
+                return SimpleMedicalLLM().invoke({'input': prompt})
+            breaker = self.client.breaker
+            if not breaker.allow():
+                return SimpleMedicalLLM().invoke({'input': prompt})
+            try:
+                response = await asyncio.wait_for(
+                    self.async_client.text_generation(
+                        prompt,
+                        max_new_tokens=300,
+                        temperature=0.7
+                    ),
+                    timeout=stage_budget_ms('generation', HF_READ_TIMEOUT_S * 1000) / 1000
+                )
+            except asyncio.CancelledError:
+                # Cancelled by the request deadline, which also spans retrieval, so
+                # not a verdict on the endpoint; free the half-open trial and re-raise
+                breaker.release()
+                raise
             except Exception as e:
+                # Our own wait_for timeout (TimeoutError) and 5xx count as failures
+                breaker.settle(e)
                 print(f"Hugging Face API error: {e}")
                 return SimpleMedicalLLM().invoke({'input': prompt})
+            breaker.record_success()
+            return response
         
-        def invoke(self, input_dict):
+        def _stream(self, prompt: str, stop: Optional[List[str]] = None, run_manager=None, **kwargs):
+            deadline = current_deadline()
+            try:
+                if deadline is not None and not deadline.allows('generation'):
+                    deadline.degrade('generation', "skipped")
+                    raise CircuitOpenError("no generation budget left")
+                # The first token (or the failure) arrives before anything is yielded
+                tokens = self.client.stream_generation(prompt, max_new_tokens=300, temperature=0.7)
+                first = next(tokens, None)
+                if first is None:
+                    raise RuntimeError("empty generation stream")
+            except CircuitOpenError:
+                first, tokens = SimpleMedicalLLM().invoke({'input': prompt}), iter(())
+            except Exception as e:
+                print(f"Hugging Face API error: {e}")
+                first, tokens = SimpleMedicalLLM().invoke({'input': prompt}), iter(())
+            yield GenerationChunk(text=first)
+            for token in tokens:
+                yield GenerationChunk(text=token)
+        
+        @staticmethod
+        def _prompt(input_dict):
             if isinstance(input_dict, dict):
-                prompt = input_dict.get('input', '')
-            else:
-                prompt = str(input_dict)
-            return self._call(prompt)
+                return input_dict.get('input', '')
+            # Prompt values from the RAG chain render to their text, not their repr
+            if hasattr(input_dict, 'to_string'):
+                return input_dict.to_string()
+            return str(input_dict)
+        
+        def invoke(self, input_dict, config=None, **kwargs):
+            return self._call(self._prompt(input_dict))
+        
+        async def ainvoke(self, input_dict, config=None, **kwargs):
+            return await self._acall(self._prompt(input_dict))
     
-    llm = HFWrapper(client)
+    llm = HFWrapper(client, async_client)
     print("✓ Using Hugging Face API for responses with LangChain compatibility")
     
 except Exception as e:
@@ -671,7 +487,12 @@ Question: {input}
 Medical Response:"""
 )
 
+answer_cache = SemanticAnswerCache(embeddings)
+question_answer_chain = None
+
 try:
+    if retriever is None:
+        raise RuntimeError("no retriever available")
     question_answer_chain = create_stuff_documents_chain(llm, doc_prompt)
     rag_chain = create_retrieval_chain(retriever, question_answer_chain)
     print("✓ RAG chain created successfully")
@@ -699,6 +520,80 @@ def track_conversation():
 def chat_page():
     return render_template("chat.html")
 
+def immediate_response(message, analysis, direct_match) -> Optional[str]:
+    """Answer built from local data alone: direct-match card or condition analysis; None if RAG/LLM is needed"""
+    if direct_match:
+        response = f"**{direct_match.get('name', 'Disease').upper()}**\n\n"
+        response += f"{direct_match.get('description', '')}\n\n"
+        
+        if direct_match.get('symptoms'):
+            response += f"**Symptoms:** {', '.join(direct_match['symptoms'])}\n\n"
+        
+        if direct_match.get('treatment'):
+            response += f"**Treatment:** {direct_match['treatment'][0]}\n\n"
+        
+        response += "For more information or if you're experiencing these symptoms, please visit your nearest clinic."
+        return response
+    
+    if len(analysis['possible_conditions']) > 0:
+        response = format_medical_response(analysis, message.text)
+        
+        if analysis['possible_conditions'][0]['confidence'] < 0.8:
+            follow_ups = generate_follow_up_questions(
+                analysis['context']['symptoms'],
+                analysis['risk_factors'],
+                analysis['context']
+            )
+            if follow_ups:
+                response += "\n\n**To better assess your condition, could you tell me:**\n"
+                for i, q in enumerate(follow_ups, 1):
+                    response += f"{i}. {q}\n"
+        return response
+    
+    return None
+
+def needs_translation(target_lang):
+    return target_lang != "en" and target_lang in SUPPORTED_TRANSLATION_LANGS
+
+def generate_answer(user_input, analysis):
+    """RAG (or plain LLM) answer for questions the local data cannot answer"""
+    if rag_chain:
+        try:
+            rag_response = rag_chain.invoke({"input": user_input})
+            response = clean_response(rag_response.get('answer', ''))
+        except:
+            response = llm.invoke({'input': user_input})
+    else:
+        response = llm.invoke({'input': user_input})
+    
+    if len(response.split()) < 20:
+        response = enhance_response(response, analysis['context'])
+    return response
+
+def degraded_answer(user_input, analysis):
+    """Cheaper tier when generation is out of time: SimpleMedicalLLM, expanded by enhance_response"""
+    response = SimpleMedicalLLM().invoke({'input': user_input})
+    if len(response.split()) < 20:
+        response = enhance_response(response, analysis['context'])
+    return response
+
+def chat_payload(session_id, message, response, analysis):
+    """Record the exchange in conversation memory and build the /get JSON body"""
+    conversation_memory.setdefault(session_id, deque(maxlen=MAX_HISTORY))
+    conversation_memory[session_id].append((ScannedText.of(message), ScannedText(response)))
+    
+    return {
+        "answer": response,
+        "session_id": session_id,
+        "context": {
+            "symptoms": analysis['context']['symptoms'],
+            "conditions": [c['disease'] for c in analysis['possible_conditions'][:3]],
+            "urgency": analysis['urgency']
+        }
+    }
+
+CHAT_ERROR_ANSWER = "I apologize, but I'm having trouble processing your request. Please try rephrasing your question or describe your symptoms in more detail."
+
 @app.route("/get", methods=["POST"])
 def get_chat_response():
     try:
@@ -717,67 +612,172 @@ def get_chat_response():
             conversation_memory[session_id] = deque(maxlen=MAX_HISTORY)
             
         input_method = data.get("input_method", "text")
-        analysis = analyze_symptoms(user_input, input_method=input_method)
-        
-        direct_match = find_matching_disease(user_input)
         
-        if direct_match:
-            response = f"**{direct_match.get('name', 'Disease').upper()}**\n\n"
-            response += f"{direct_match.get('description', '')}\n\n"
+        # Each stage gets what is left of the request budget; one that runs out
+        # answers from the next cheaper tier instead of holding the request
+        # One knowledge snapshot for the whole request, even if a reload lands mid-way
+        snapshot = knowledge.current
+        with Deadline() as deadline:
+            # Normalized and lexicon-matched once, shared by every analysis step
+            message = parse_message(user_input, snapshot)
+            analysis = analyze_symptoms(message, input_method=input_method, snapshot=snapshot)
             
-            if direct_match.get('symptoms'):
-                response += f"**Symptoms:** {', '.join(direct_match['symptoms'])}\n\n"
+            direct_match = find_matching_disease(message, snapshot)
+            response = immediate_response(message, analysis, direct_match)
+            generated = response is None
             
-            if direct_match.get('treatment'):
-                response += f"**Treatment:** {direct_match['treatment'][0]}\n\n"
+            if generated:
+                # Semantically identical questions reuse the earlier (already
+                # translated) answer instead of another retrieval + BioGPT call
+                cached = answer_cache.get(user_input, target_lang)
+                if cached is not None:
+                    return jsonify(chat_payload(session_id, message, cached, analysis))
+                
+                response = deadline.run('generation', generate_answer, user_input, analysis,
+                                        fallback=lambda: degraded_answer(user_input, analysis))
             
-            response += "For more information or if you're experiencing these symptoms, please visit your nearest clinic."
-        
-        elif len(analysis['possible_conditions']) > 0:
-            response = format_medical_response(analysis, user_input)
+            if needs_translation(target_lang):
+                english = response
+                response = deadline.run('translation', translate_text, response, target_lang,
+                                        fallback=lambda: english)
             
-            if analysis['possible_conditions'][0]['confidence'] < 0.8:
-                follow_ups = generate_follow_up_questions(
-                    analysis['context']['symptoms'],
-                    analysis['risk_factors'],
-                    analysis['context']
-                )
-                if follow_ups:
-                    response += "\n\n**To better assess your condition, could you tell me:**\n"
-                    for i, q in enumerate(follow_ups, 1):
-                        response += f"{i}. {q}\n"
-        
-        else:
-            if rag_chain:
-                try:
-                    rag_response = rag_chain.invoke({"input": user_input})
-                    response = clean_response(rag_response.get('answer', ''))
-                except:
-                    response = llm.invoke({'input': user_input})
-            else:
-                response = llm.invoke({'input': user_input})
+            # Degraded answers are not cached, the next asker gets the full one
+            if generated and not deadline.degraded:
+                answer_cache.put(user_input, response, target_lang)
             
-            if len(response.split()) < 20:
-                response = enhance_response(response, analysis['context'])
-        
-        if target_lang != "en" and target_lang in SUPPORTED_TRANSLATION_LANGS:
-            response = translate_text(response, target_lang)
-        
-        conversation_memory[session_id].append((user_input, response))
-        
-        return jsonify({
-            "answer": response,
-            "session_id": session_id,
-            "context": {
-                "symptoms": analysis['context']['symptoms'],
-                "conditions": [c['disease'] for c in analysis['possible_conditions'][:3]],
-                "urgency": analysis['urgency']
-            }
-        })
+            payload = chat_payload(session_id, message, response, analysis)
+            if deadline.degraded:
+                payload['degraded'] = deadline.degraded
+            return jsonify(payload)
         
     except Exception as e:
         logger.error(f"Chat error: {str(e)}", exc_info=True)
-        return jsonify({"answer": "I apologize, but I'm having trouble processing your request. Please try rephrasing your question or describe your symptoms in more detail."}), 200
+        return jsonify({"answer": CHAT_ERROR_ANSWER}), 200
+
+def stream_answer(user_input):
+    """Streaming counterpart of generate_answer: yields the RAG (or plain LLM) answer in chunks"""
+    chunks = None
+    deadline = current_deadline()
+    if rag_chain:
+        try:
+            if deadline is not None:
+                docs = deadline.run('retrieval', retriever.invoke, user_input, fallback=lambda: None)
+            else:
+                docs = retriever.invoke(user_input)
+            # Out of retrieval budget: answer from the LLM alone
+            if docs is not None:
+                chunks = question_answer_chain.stream({"input": user_input, "context": docs})
+        except Exception as e:
+            logger.error(f"Retrieval for streaming failed: {str(e)}")
+    if chunks is None:
+        chunks = llm.stream(user_input) if hasattr(llm, 'stream') else iter([llm.invoke({'input': user_input})])
+    for chunk in chunks:
+        if chunk:
+            yield chunk
+
+def sse(event, data):
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+@app.route("/get_stream", methods=["POST"])
+def get_chat_stream():
+    """/get as server-sent events: the parts known from local data first, then the LLM tokens.
+
+    Events: `ack` (acknowledgement of the symptoms), `urgency` (banner for
+    moderate/high urgency), `card` (direct-match disease card), `token`
+    (generated text as it arrives, English targets only) and finally `done`
+    carrying the same payload /get returns, whose answer replaces the
+    provisional text. A stream that stalls past the generation budget or runs
+    past STREAM_DEADLINE_MS is cut, and `done` then carries the answer so far
+    (or the fallback tier) with `degraded`. Errors end the stream with an
+    `error` event.
+    """
+    data = request.get_json(silent=True)
+    if not data or 'msg' not in data:
+        return jsonify({"error": "Invalid request format"}), 400
+    
+    user_input = data.get("msg", "").strip()
+    if not user_input:
+        return jsonify({"error": "Empty message"}), 400
+    
+    session_id = data.get("session_id", "default")
+    target_lang = data.get("lang", "en")
+    input_method = data.get("input_method", "text")
+    translate = needs_translation(target_lang)
+    snapshot = knowledge.current
+    
+    def events():
+        try:
+            # Longer than /get's budget since tokens show as they come, but a stalled
+            # upstream is still cut: every token waits at most the generation budget
+            with Deadline(STREAM_DEADLINE_MS) as deadline:
+                def localized(text):
+                    if not translate:
+                        return text
+                    return deadline.run('translation', translate_text, text, target_lang, fallback=lambda: text)
+                
+                message = parse_message(user_input, snapshot)
+                analysis = analyze_symptoms(message, input_method=input_method, snapshot=snapshot)
+                direct_match = find_matching_disease(message, snapshot)
+                
+                ack = acknowledgement(analysis['context']['symptoms'])
+                if ack:
+                    yield sse('ack', {"text": localized(ack)})
+                if analysis['urgency'] in ('high', 'moderate'):
+                    yield sse('urgency', {"level": analysis['urgency'],
+                                          "text": localized(URGENCY_BANNERS[analysis['urgency']])})
+                
+                response = immediate_response(message, analysis, direct_match)
+                generated = response is None
+                if direct_match:
+                    # The card is the whole answer, so it is translated only once
+                    response = localized(response)
+                    yield sse('card', {"text": response})
+                
+                if generated:
+                    cached = answer_cache.get(user_input, target_lang)
+                    if cached is not None:
+                        yield sse('done', chat_payload(session_id, message, cached, analysis))
+                        return
+                    
+                    if translate:
+                        # English tokens would only be replaced by the translation, so
+                        # translated sessions get the whole answer under /get's budget
+                        response = deadline.run('generation', generate_answer, user_input, analysis,
+                                                fallback=lambda: degraded_answer(user_input, analysis))
+                    else:
+                        parts = []
+                        for chunk in deadline.stream('generation', stream_answer(user_input)):
+                            parts.append(chunk)
+                            yield sse('token', {"text": chunk})
+                        response = clean_response("".join(parts))
+                        if not response and 'generation' not in deadline.degraded:
+                            # Nothing generated is a failed generation, not an empty answer
+                            deadline.degrade('generation', "returned no text")
+                        if len(response.split()) < 20:
+                            # Cut off before saying much: the cheaper tier, as /get falls back to
+                            if 'generation' in deadline.degraded:
+                                response = degraded_answer(user_input, analysis)
+                            else:
+                                response = enhance_response(response, analysis['context'])
+                
+                if not direct_match:
+                    response = localized(response)
+                
+                if generated and not deadline.degraded:
+                    answer_cache.put(user_input, response, target_lang)
+                
+                payload = chat_payload(session_id, message, response, analysis)
+                if deadline.degraded:
+                    payload['degraded'] = deadline.degraded
+                yield sse('done', payload)
+        
+        except Exception as e:
+            logger.error(f"Chat stream error: {str(e)}", exc_info=True)
+            yield sse('error', {"answer": CHAT_ERROR_ANSWER})
+    
+    # No proxy buffering, or the early events would sit in nginx until the end
+    return Response(stream_with_context(events()), mimetype="text/event-stream",
+                    headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
 
 @login_manager.user_loader
 def load_user(user_id):
@@ -920,15 +920,18 @@ def record_audio():
         transcription = transcribe_audio_free(audio_bytes)
         
         if transcription:
+            snapshot = knowledge.current
+            message = parse_message(transcription, snapshot)
             if session_id not in voice_transcriptions:
                 voice_transcriptions[session_id] = []
             voice_transcriptions[session_id].append({
                 'timestamp': datetime.now().strftime("%H:%M:%S"),
                 'text': transcription,
-                'speaker': 'patient'
+                'speaker': 'patient',
+                'parsed': ScannedText.of(message)
             })
             
-            analysis = analyze_symptoms(transcription, input_method="voice")
+            analysis = analyze_symptoms(message, input_method="voice", snapshot=snapshot)
             
             return jsonify({
                 "transcription": transcription,
@@ -963,7 +966,7 @@ def get_conversation_summary():
             all_messages.append(ai_response)
         
         for voice in voice_data:
-            all_messages.append(voice['text'])
+            all_messages.append(voice.get('parsed') or voice['text'])
         
         summary = summarize_conversation(all_messages)
         
@@ -988,80 +991,17 @@ def analyze_body_region():
         symptoms = data.get('symptoms', [])
         session_id = data.get('session_id', 'default')
         
-        region_conditions = {
-            'head': {
-                'conditions': ['migraine', 'tension headache', 'sinusitis', 'meningitis', 'concussion', 'stroke', 'brain tumor',
-                               'ear infection', 'glaucoma', 'temporal arteritis', 'cluster headache', 'giant cell arteritis', 'cervical spondylosis',
-                               'trigeminal neuralgia', 'dental abscess', 'otitis media', 'mastoiditis', 'acute glaucoma', 'subarachnoid hemorrhage'],
-                'symptoms': ['headache', 'dizziness', 'vision problems', 'ear pain', 'nausea', 'vomiting', 'neck stiffness'],
-                'urgent_signs': ['severe headache with fever', 'neck stiffness', 'confusion','loss of consciousness', 'seizures' ,
-                                 'weakness on one side', 'slurred speech' , 'sudden vision loss' , 'severe head trauma' ,'nausea and vomiting' ,
-                                 'loss of balance' , 'persistent vomiting' , 'pupil changes' , 'severe headache after head injury']
-            },
-            'chest': {
-                'conditions': ['heart attack', 'pneumonia', 'bronchitis', 'asthma', 'angina', 'pulmonary embolism', 'pneumothorax', 'pericarditis',
-                               'aortic dissection', 'esophageal rupture', 'costochondritis', 'gastroesophageal reflux disease (GERD)', 'lung cancer',
-                               'tuberculosis', 'pleurisy', 'heart failure', 'myocarditis', 'endocarditis', 'valvular heart disease', 'arrhythmia'],
-                'symptoms': ['chest pain', 'shortness of breath', 'cough', 'palpitations', 'fatigue', 'wheezing', 'rapid heartbeat', ],
-                'urgent_signs': ['crushing chest pain', 'difficulty breathing', 'coughing blood', 'sudden severe pain', 'loss of consciousness', 'severe shortness of breath']
-            },
-            'abdomen': {
-                'conditions': ['appendicitis', 'gastroenteritis', 'ulcer', 'gallstones', 'pancreatitis', 'diverticulitis', 'hernia', 'kidney stones',
-                               'liver disease', 'intestinal obstruction', 'ectopic pregnancy', 'ovarian cysts', 'pelvic inflammatory disease (PID)', 'inflammatory bowel disease (IBD)',
-                               'irritable bowel syndrome (IBS)', 'cholecystitis', 'hepatitis', 'peritonitis', 'abdominal aortic aneurysm', 'celiac disease'],
-                'symptoms': ['abdominal pain', 'nausea', 'vomiting', 'diarrhea', 'bloating', 'constipation', 'loss of appetite', 'fever'],
-                'urgent_signs': ['severe pain', 'rigid abdomen', 'bloody stool', 'persistent vomiting', 'high fever', 'jaundice', 'difficulty breathing', 'severe dehydration', 'sudden weight loss',
-                                 'swelling of abdomen', 'severe abdominal distension', 'severe tenderness to touch', 'inability to pass stool or gas', 'severe abdominal cramping', 'blood in vomit', 'severe abdominal pain radiating to back', 'fainting or dizziness' ]
-            },
-            'back': {
-                'conditions': ['muscle strain', 'herniated disc', 'kidney stones', 'spinal issues', 'sciatica', 'osteoporosis', 'arthritis', 'spinal stenosis',
-                               'spondylolisthesis', 'vertebral fracture', 'infections (e.g., osteomyelitis)', 'tumors (benign or malignant)', 'cauda equina syndrome',
-                               'ankylosing spondylitis', 'fibromyalgia', 'degenerative disc disease', 'spinal cord injury', 'discitis', 'sacroiliitis', 'spinal abscess'],
-                'symptoms': ['back pain', 'stiffness', 'numbness', 'tingling', 'weakness', 'limited mobility', 'muscle spasms', 'pain radiating down legs'],
-                'urgent_signs': ['loss of bladder control', 'severe pain with fever', 'paralysis', 'saddle anesthesia', 'severe trauma', 'unexplained weight loss',
-                                 'night pain', 'progressive weakness', 'loss of sensation in groin area', 'severe back pain after fall or accident', 'bowel incontinence',
-                                 'severe back pain with fever and chills']
-            },
-            'arms': {
-                'conditions': ['fracture', 'tendinitis', 'carpal tunnel', 'arthritis', 'bursitis', 'nerve compression', 'muscle strain', 'rotator cuff injury',
-                               'dislocation', 'cubital tunnel syndrome', 'thoracic outlet syndrome', 'ganglion cyst', 'complex regional pain syndrome (CRPS)', 'peripheral neuropathy',
-                               'osteomyelitis', 'lymphangitis', 'deep vein thrombosis (DVT)', 'compartment syndrome', 'vascular injury'],
-                'symptoms': ['arm pain', 'weakness', 'numbness', 'swelling', 'tingling', 'limited movement', 'muscle cramps', 'joint stiffness'],
-                'urgent_signs': ['deformity', 'severe pain', 'loss of pulse', 'numbness', 'open wound', 'sudden swelling', 'severe bleeding', 'loss of sensation', 'inability to move the arm',
-                                 'severe deformity or angulation', 'severe swelling with skin changes', 'loss of pulse or cold extremity', 'severe bleeding', 'open fracture with bone protruding', 'severe pain unrelieved by rest or medication']
-            },
-            'legs': {
-                'conditions': ['DVT', 'fracture', 'muscle cramp', 'varicose veins', 'peripheral artery disease', 'cellulitis', 'arthritis', 'bursitis',
-                               'tendonitis', 'compartment syndrome', 'osteomyelitis', 'peripheral neuropathy', 'deep vein thrombosis (DVT)', 'chronic venous insufficiency',
-                               'lymphedema', 'gout', 'restless leg syndrome', 'spinal stenosis', 'sciatica', 'vascular injury'],
-                'symptoms': ['leg pain', 'swelling', 'cramping', 'weakness', 'numbness', 'tingling', 'limited mobility', 'skin changes', 'redness'],
-                'urgent_signs': ['sudden swelling', 'chest pain with leg pain', 'loss of feeling', 'severe pain', 'open wound', 'severe bleeding', 'inability to move the leg',
-                                 'sudden onset of leg swelling and pain', 'pain worsened by walking', 'chest pain or shortness of breath with leg pain', 'loss of sensation or movement in the leg',
-                                 'severe deformity or angulation', 'open fracture with bone protruding', 'severe bleeding', 'severe pain unrelieved by rest or medication']
-            }
-        }
-        
-        region_data = region_conditions.get(body_region, {})
+        snapshot = knowledge.current
+        region = snapshot.body_regions.get(body_region)
+        symptom_text = ' '.join(symptoms)
         
-        analysis_prompt = f"""
-        Patient has indicated {body_region} region symptoms.
-        Reported symptoms: {', '.join(symptoms)}
-        Common conditions for this region: {', '.join(region_data.get('conditions', []))}
-        
-        Provide detailed medical analysis considering South African health context.
-        """
-        
-        enhanced_analysis = analyze_symptoms(' '.join(symptoms))
-        
-        urgent = any(sign in ' '.join(symptoms).lower() 
-                    for sign in region_data.get('urgent_signs', []))
-        
-        enhanced_analysis = analyze_symptoms(' '.join(symptoms), input_method="body_map")
+        enhanced_analysis = analyze_symptoms(symptom_text, input_method="body_map", snapshot=snapshot)
+        urgent = region.is_urgent(symptom_text.lower())
         
         response = {
             'region': body_region,
-            'possible_conditions': region_data.get('conditions', []),
-            'common_symptoms': region_data.get('symptoms', []),
+            'possible_conditions': region.conditions,
+            'common_symptoms': region.symptoms,
             'analysis': enhanced_analysis,
             'reasoning': enhanced_analysis.get('reasoning', ''),
             'urgent': urgent,
@@ -1075,6 +1015,36 @@ def analyze_body_region():
         logger.error(f"Body region analysis error: {str(e)}")
         return jsonify({'error': str(e), 'success': False}), 500
     
+batch_pool = None
+
+def get_batch_pool():
+    """Process pool for batch triage, started on first use and reused across uploads"""
+    global batch_pool
+    if batch_pool is None:
+        batch_pool = make_batch_pool()
+    return batch_pool
+
+@app.route("/analyze_batch", methods=["POST"])
+def analyze_batch():
+    """Triage an upload of intake texts (JSON lines or CSV), streaming one JSON result per line"""
+    upload = request.files.get('file')
+    stream = upload.stream if upload else request.stream
+    filename = upload.filename if upload else ''
+    is_csv = (request.args.get('format') == 'csv' or 'csv' in (request.content_type or '')
+              or filename.lower().endswith('.csv'))
+    lines = io.TextIOWrapper(stream, encoding='utf-8', newline='')
+    
+    def generate():
+        try:
+            records = read_intake(lines, 'csv' if is_csv else 'jsonl')
+            for result in iter_triage(records, pool=get_batch_pool()):
+                yield json.dumps(result) + "\n"
+        except Exception as e:
+            logger.error(f"Batch triage error: {str(e)}")
+            yield json.dumps({"error": str(e)}) + "\n"
+    
+    return Response(stream_with_context(generate()), mimetype="application/x-ndjson")
+    
 @app.route("/body_map")
 def body_map():
     return render_template("body_map.html")
@@ -1133,7 +1103,9 @@ def format_medical_report(summary: dict, session_id: str) -> str:
 
 print("\n=== System Verification ===")
 print(f"✓ Flask app initialized")
-print(f"✓ Medical data loaded: {len(medical_disease_data)} diseases")
+# Edits to medical_disease.json / reasoning_rules.json are picked up without a restart
+knowledge.watch()
+print(f"✓ Medical data loaded: {len(knowledge.current)} diseases (snapshot {knowledge.current.version})")
 print(f"✓ Embeddings initialized")
 print(f"✓ Server ready at http://localhost:5000")
 
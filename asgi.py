@@ -0,0 +1,128 @@
+#this file is asgi.py
+import asyncio
+import logging
+import os
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager
+
+from a2wsgi import WSGIMiddleware
+from starlette.applications import Starlette
+from starlette.responses import JSONResponse
+from starlette.routing import Mount, Route
+
+import app as chatbot
+from src.deadline import Deadline
+
+logger = logging.getLogger(__name__)
+
+# Threads for the calls that have no asyncio client (Pinecone, googletrans,
+# the embedding model); the LLM call itself is awaited without a thread
+ASYNC_BLOCKING_THREADS = int(os.environ.get("ASYNC_BLOCKING_THREADS", 64))
+
+
+async def llm_answer(user_input):
+    if hasattr(chatbot.llm, "ainvoke"):
+        return await chatbot.llm.ainvoke({'input': user_input})
+    return chatbot.llm.invoke({'input': user_input})
+
+
+async def generate_answer(user_input, analysis, docs):
+    """Async counterpart of app.generate_answer, given the already retrieved documents"""
+    if chatbot.rag_chain and not isinstance(docs, BaseException):
+        try:
+            answer = await chatbot.question_answer_chain.ainvoke({"input": user_input, "context": docs})
+            response = chatbot.clean_response(answer)
+        except Exception:
+            response = await llm_answer(user_input)
+    else:
+        response = await llm_answer(user_input)
+
+    if len(response.split()) < 20:
+        response = chatbot.enhance_response(response, analysis['context'])
+    return response
+
+
+async def retrieve(user_input):
+    try:
+        return await chatbot.retriever.ainvoke(user_input)
+    except Exception as e:
+        return e
+
+
+async def get_chat_response(request):
+    """/get on the event loop: network stages are awaited, so a worker holds many conversations"""
+    try:
+        try:
+            data = await request.json()
+        except Exception:
+            data = None
+        if not data or 'msg' not in data:
+            return JSONResponse({"error": "Invalid request format"}, status_code=400)
+
+        user_input = data.get("msg", "").strip()
+        if not user_input:
+            return JSONResponse({"error": "Empty message"}, status_code=400)
+
+        session_id = data.get("session_id", "default")
+        target_lang = data.get("lang", "en")
+        input_method = data.get("input_method", "text")
+
+        snapshot = chatbot.knowledge.current
+        with Deadline() as deadline:
+            message = chatbot.parse_message(user_input, snapshot)
+            analysis = chatbot.analyze_symptoms(message, input_method=input_method, snapshot=snapshot)
+            direct_match = chatbot.find_matching_disease(message, snapshot)
+            response = chatbot.immediate_response(message, analysis, direct_match)
+            generated = response is None
+
+            if generated:
+                # Retrieval starts alongside the answer-cache lookup and is dropped on a hit
+                retrieval = asyncio.create_task(retrieve(user_input)) if chatbot.rag_chain else None
+                cached = await asyncio.to_thread(chatbot.answer_cache.get, user_input, target_lang)
+                if cached is not None:
+                    if retrieval:
+                        retrieval.cancel()
+                    return JSONResponse(chatbot.chat_payload(session_id, message, cached, analysis))
+
+                async def full_answer():
+                    docs = await retrieval if retrieval else None
+                    return await generate_answer(user_input, analysis, docs)
+
+                response = await deadline.arun('generation', full_answer(),
+                                               fallback=lambda: chatbot.degraded_answer(user_input, analysis))
+
+            if chatbot.needs_translation(target_lang):
+                english = response
+                response = await deadline.arun(
+                    'translation', asyncio.to_thread(chatbot.translate_text, response, target_lang),
+                    fallback=lambda: english)
+
+            # Degraded answers are not cached, the next asker gets the full one
+            if generated and not deadline.degraded:
+                await asyncio.to_thread(chatbot.answer_cache.put, user_input, response, target_lang)
+
+            payload = chatbot.chat_payload(session_id, message, response, analysis)
+            if deadline.degraded:
+                payload['degraded'] = deadline.degraded
+            return JSONResponse(payload)
+
+    except Exception as e:
+        logger.error(f"Chat error: {str(e)}", exc_info=True)
+        return JSONResponse({"answer": chatbot.CHAT_ERROR_ANSWER})
+
+
+@asynccontextmanager
+async def lifespan(app):
+    asyncio.get_running_loop().set_default_executor(
+        ThreadPoolExecutor(max_workers=ASYNC_BLOCKING_THREADS, thread_name_prefix="blocking-io"))
+    yield
+
+
+# /get is served natively on the event loop; every other route is the Flask app
+app = Starlette(
+    routes=[
+        Route("/get", get_chat_response, methods=["POST"]),
+        Mount("/", app=WSGIMiddleware(chatbot.app)),
+    ],
+    lifespan=lifespan,
+)
@@ -0,0 +1,114 @@
+#this file is src/analysis.py
+from typing import Dict, Any, Optional
+from src.message import parse_message
+
+# Kept free of the Flask app, LLM and retrieval setup so the batch triage pool
+# workers can import it cheaply. Disease data, indexes and rules come from the
+# knowledge snapshot the caller took once for the whole request.
+
+def find_matching_disease(user_input, snapshot) -> Optional[Dict[str, Any]]:
+    """Find matching disease using improved matching logic."""
+    # Exact name or alias, then name ignoring spaces, then >= 2 shared symptoms,
+    # all from one automaton pass over the message. The text as typed, not the
+    # spelling-corrected one: a correction should never pick the disease
+    return snapshot.disease_index.match(parse_message(user_input, snapshot).lower)
+
+def analyze_symptoms(user_input, lang: str = "en", input_method: str = "text", *, snapshot) -> Dict:
+    """Enhanced symptom analysis with better pattern matching"""
+    context = {
+        'symptoms': [],
+        'locations': [],
+        'activities': [],
+        'contacts': [],
+        'timeframe': None,
+        'severity': None
+    }
+    
+    # Lexicon hits come from the message's single matcher pass
+    hits = parse_message(user_input, snapshot).hits
+    context['symptoms'] = hits['symptom']
+    context['locations'] = hits['location']
+    context['activities'] = hits['activity']
+    
+    # One sparse product over the disease x feature matrix, top 5 by confidence
+    possible_conditions = snapshot.disease_index.score(context)
+    
+    urgency = 'low'
+    if hits['urgent']:
+        urgency = 'high'
+    elif len(context['symptoms']) >= 3 or 'fever' in context['symptoms']:
+        urgency = 'moderate'
+    
+    result = {
+        'context': context,
+        'possible_conditions': possible_conditions,
+        'urgency': urgency,
+        'risk_factors': {
+            'travel': 'travel' in context['activities'],
+            'sexual': 'sexual' in context['activities']
+        }
+    }
+    
+    result = enhance_ai_reasoning(result, input_method, snapshot=snapshot)
+    
+    return result
+
+def enhance_ai_reasoning(analysis: dict, input_method: str = "text", *, snapshot) -> dict:
+    """Enhanced multi-modal reasoning for better diagnosis"""
+    
+    confidence_boost = {
+        'voice': 1.1,
+        'body_map': 1.2,
+        'text': 1.0
+    }
+    
+    if input_method == 'body_map':
+        for condition in analysis['possible_conditions']:
+            condition['confidence'] *= confidence_boost[input_method]
+            condition['precision'] = 'high'
+    
+    # Symptom-pattern rules from the data file, evaluated as bitsets
+    snapshot.rules.apply(analysis)
+    
+    if 'locations' in analysis['context']:
+        for loc in analysis['context']['locations']:
+            if any(area in loc.lower() for area in ['limpopo', 'mpumalanga', 'kzn', 'kwazulu']):
+                for cond in analysis['possible_conditions']:
+                    if 'malaria' in cond['disease'].lower():
+                        cond['confidence'] = min(cond['confidence'] * 1.4, 0.95)
+                        cond['geographic_risk'] = 'high'
+    
+    analysis['reasoning'] = generate_diagnostic_reasoning(analysis)
+    
+    return analysis
+
+def generate_diagnostic_reasoning(analysis: dict) -> str:
+    """Generate explanation of diagnostic reasoning"""
+    
+    reasoning = []
+    
+    if analysis['possible_conditions']:
+        top = analysis['possible_conditions'][0]
+        
+        if top['confidence'] > 0.7:
+            reasoning.append(f"High confidence for {top['disease']} due to:")
+        else:
+            reasoning.append(f"Considering {top['disease']} because:")
+        
+        if top.get('matched_symptoms'):
+            reasoning.append(f"matching symptoms: {', '.join(top['matched_symptoms'])}")
+        
+        if top.get('pattern_match'):
+            reasoning.append("classic symptom pattern")
+        
+        if top.get('geographic_risk'):
+            reasoning.append("high geographic risk area")
+        
+        if analysis['urgency'] == 'high':
+            reasoning.append("⚠️ URGENT: immediate care recommended")
+        elif analysis['urgency'] == 'moderate':
+            reasoning.append("⚠️ Important: clinic visit within 24 hours")
+    
+    reasoning.append("Based on South African clinical guidelines")
+    
+    return ". ".join(reasoning)
@@ -0,0 +1,109 @@
+#this file is src/answer_cache.py
+import logging
+import os
+import threading
+import time
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+ANSWER_CACHE_THRESHOLD = float(os.environ.get("ANSWER_CACHE_THRESHOLD", 0.92))
+ANSWER_CACHE_TTL_S = float(os.environ.get("ANSWER_CACHE_TTL_S", 6 * 3600))
+ANSWER_CACHE_SIZE = int(os.environ.get("ANSWER_CACHE_SIZE", 2048))
+
+
+class _LanguageShard:
+    """Fixed-capacity vector table of cached answers for one language"""
+
+    def __init__(self, capacity, dimension):
+        self.vectors = np.zeros((capacity, dimension), dtype=np.float32)
+        self.answers = [None] * capacity
+        self.expires = np.zeros(capacity, dtype=np.float64)
+        self.last_used = np.zeros(capacity, dtype=np.float64)
+
+    def live(self, now):
+        return self.expires > now
+
+    def free_slot(self, now):
+        # Expired (or never used) slots first, otherwise the least recently used
+        expired = np.flatnonzero(~self.live(now))
+        if len(expired):
+            return int(expired[0])
+        return int(np.argmin(self.last_used))
+
+
+class SemanticAnswerCache:
+    """Answers to earlier questions, looked up by query-embedding similarity.
+
+    A new question reuses a cached answer when its cosine similarity to a
+    cached question is at least `threshold`, so "what are malaria symptoms"
+    and "What are the symptoms of malaria?" share one RAG/LLM call. Entries
+    are scoped per response language, expire after `ttl_s` and are evicted
+    least-recently-used once a language holds `max_entries`. The cache never
+    fails a request: a query that cannot be embedded in time (the embedder
+    is bounded by the retrieval budget) is a miss, and is not stored.
+    """
+
+    def __init__(self, embeddings, threshold=ANSWER_CACHE_THRESHOLD, ttl_s=ANSWER_CACHE_TTL_S,
+                 max_entries=ANSWER_CACHE_SIZE):
+        self.embeddings = embeddings
+        self.threshold = threshold
+        self.ttl_s = ttl_s
+        self.max_entries = max_entries
+        self._shards = {}
+        self._lock = threading.Lock()
+
+    def _embed(self, query):
+        try:
+            vector = np.asarray(self.embeddings.embed_query(query), dtype=np.float32)
+        except Exception as e:
+            logger.warning(f"Answer cache skipped, query not embedded: {e!r}")
+            return None
+        return vector / max(float(np.linalg.norm(vector)), 1e-12)
+
+    def get(self, query, lang="en"):
+        """Return the cached answer for a semantically identical question, or None"""
+        if self.max_entries <= 0:
+            return None
+        vector = self._embed(query)
+        if vector is None:
+            return None
+        now = time.time()
+        with self._lock:
+            shard = self._shards.get(lang)
+            if shard is None:
+                return None
+            live = np.flatnonzero(shard.live(now))
+            if len(live) == 0:
+                return None
+            scores = shard.vectors[live] @ vector
+            best = int(np.argmax(scores))
+            if scores[best] < self.threshold:
+                return None
+            slot = live[best]
+            shard.last_used[slot] = now
+            logger.info(f"Answer cache hit ({scores[best]:.3f}) for [{lang}] {query[:60]!r}")
+            return shard.answers[slot]
+
+    def put(self, query, answer, lang="en"):
+        if self.max_entries <= 0 or not answer:
+            return
+        vector = self._embed(query)
+        if vector is None:
+            return
+        now = time.time()
+        with self._lock:
+            shard = self._shards.get(lang)
+            if shard is None:
+                shard = self._shards[lang] = _LanguageShard(self.max_entries, len(vector))
+            slot = shard.free_slot(now)
+            shard.vectors[slot] = vector
+            shard.answers[slot] = answer
+            shard.expires[slot] = now + self.ttl_s
+            shard.last_used[slot] = now
+
+    def __len__(self):
+        now = time.time()
+        with self._lock:
+            return sum(int(shard.live(now).sum()) for shard in self._shards.values())
@@ -0,0 +1,148 @@
+#this file is src/batch.py
+import csv
+import json
+import logging
+import multiprocessing
+import os
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice
+
+logger = logging.getLogger(__name__)
+
+BATCH_WORKERS = int(os.environ.get("BATCH_WORKERS", 0)) or os.cpu_count() or 1
+# Intake rows per pool task; big enough to amortize pickling, small enough to stream
+BATCH_TASK_SIZE = int(os.environ.get("BATCH_TASK_SIZE", 64))
+TEXT_FIELDS = ("text", "msg", "symptoms")
+
+
+def _jsonl_rows(lines):
+    for line in lines:
+        if not line.strip():
+            continue
+        try:
+            row = json.loads(line)
+        except ValueError as e:
+            yield None, f"Invalid JSON: {e}"
+            continue
+        if isinstance(row, str):
+            row = {"text": row}
+        if not isinstance(row, dict):
+            yield None, f"Expected a JSON object or string, got {type(row).__name__}"
+            continue
+        yield row, None
+
+
+def _csv_rows(lines):
+    reader = csv.DictReader(lines)
+    while True:
+        try:
+            row = next(reader)
+        except StopIteration:
+            return
+        except csv.Error as e:
+            yield None, f"Invalid CSV row: {e}"
+            continue
+        yield row, None
+
+
+def read_intake(lines, fmt="jsonl"):
+    """Yield intake records ({"id", "text", ...}) from JSON lines or CSV text lines.
+
+    A row that cannot be read becomes {"id": row_number, "error": ...} and
+    the rest of the input is still processed.
+    """
+    rows = _csv_rows(lines) if fmt == "csv" else _jsonl_rows(lines)
+    for row_number, (row, error) in enumerate(rows, 1):
+        if error is not None:
+            logger.warning(f"Skipping intake row {row_number}: {error}")
+            yield {"id": row_number, "error": error}
+            continue
+        row.setdefault("id", row_number)
+        yield row
+
+
+def _record_text(record):
+    for field in TEXT_FIELDS:
+        if record.get(field):
+            return str(record[field])
+    return ""
+
+
+def triage(record, snapshot):
+    """analyze_symptoms and find_matching_disease for one intake record"""
+    from src.analysis import analyze_symptoms, find_matching_disease
+    from src.message import parse_message
+
+    text = _record_text(record)
+    if not text.strip():
+        # Rows read_intake could not parse carry their error through
+        return {"id": record.get("id"), "error": record.get("error") or "Empty text"}
+    try:
+        message = parse_message(text, snapshot)
+        analysis = analyze_symptoms(message, input_method=record.get("input_method") or "text", snapshot=snapshot)
+        match = find_matching_disease(message, snapshot)
+    except Exception as e:
+        logger.error(f"Triage failed for record {record.get('id')}: {e}")
+        return {"id": record.get("id"), "error": str(e)}
+    return {
+        "id": record.get("id"),
+        "urgency": analysis["urgency"],
+        "matched_disease": match.get("name") if match else None,
+        "possible_conditions": analysis["possible_conditions"],
+        "context": analysis["context"],
+        "risk_factors": analysis["risk_factors"],
+        "reasoning": analysis.get("reasoning", ""),
+    }
+
+
+def _triage_batch(records):
+    from src.snapshot import knowledge
+
+    # Pool workers have no watcher thread; pick up edited data files per task
+    knowledge.reload()
+    snapshot = knowledge.current
+    return [triage(record, snapshot) for record in records]
+
+
+def make_batch_pool(workers=BATCH_WORKERS):
+    """Process pool for triage whose workers do not inherit the parent's threads.
+
+    The web app runs threads (query batching, knowledge watcher, HF pools)
+    and forking a threaded process can deadlock the child on a lock held at
+    fork time, so workers come from a forkserver (spawn where unavailable).
+    """
+    method = "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn"
+    return ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context(method))
+
+
+def iter_triage(records, workers=BATCH_WORKERS, task_size=BATCH_TASK_SIZE, max_pending=None, pool=None):
+    """Stream triage results for records, in input order.
+
+    Records are sent to a process pool in tasks of task_size; at most
+    max_pending tasks (default: two per worker) are in flight, so neither the
+    input nor the results are ever held in memory as a whole. An existing
+    pool can be passed in to avoid paying worker start-up per call.
+    """
+    # Not helper.batched: src.helper pulls in LangChain, which the workers never need
+    records = iter(records)
+    tasks = iter(lambda: list(islice(records, task_size)), [])
+    if workers <= 1 and pool is None:
+        for task in tasks:
+            yield from _triage_batch(task)
+        return
+
+    max_pending = max_pending or 2 * workers
+    owned = pool is None
+    pool = pool or make_batch_pool(workers)
+    try:
+        pending = deque()
+        for task in tasks:
+            pending.append(pool.submit(_triage_batch, task))
+            if len(pending) >= max_pending:
+                yield from pending.popleft().result()
+        while pending:
+            yield from pending.popleft().result()
+    finally:
+        if owned:
+            pool.shutdown(cancel_futures=True)
@@ -0,0 +1,41 @@
+#this file is src/body_regions.py
+from src.matcher import KeywordMatcher
+
+BODY_REGIONS_FILE = "Data/Medbook-home3/body_regions.json"
+
+
+class BodyRegion:
+    """Conditions, common symptoms and a compiled urgent-sign matcher for one body region"""
+
+    def __init__(self, name, data):
+        self.name = name
+        self.conditions = list(data.get('conditions', []))
+        self.symptoms = list(data.get('symptoms', []))
+        self.urgent_signs = list(data.get('urgent_signs', []))
+        # Plain substring semantics, as the per-sign `sign in text` scan had
+        self._urgent = KeywordMatcher(word_boundary=False)
+        for sign in self.urgent_signs:
+            self._urgent.add(sign, sign)
+        self._urgent.build()
+
+    def urgent_signs_in(self, text):
+        """Urgent signs of this region mentioned in lowercased text"""
+        return self._urgent.matches(text)
+
+    def is_urgent(self, text):
+        return next(self._urgent.find(text), None) is not None
+
+
+class BodyRegionTable:
+    """The body map's region table, indexed by region name"""
+
+    def __init__(self, regions):
+        self.regions = {name: BodyRegion(name, data) for name, data in regions.items()}
+        self._empty = BodyRegion(None, {})
+
+    def get(self, name):
+        """The region, or an empty one (no conditions, never urgent) for unknown names"""
+        return self.regions.get(name, self._empty)
+
+    def __len__(self):
+        return len(self.regions)
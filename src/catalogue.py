@@ -0,0 +1,38 @@
+#this file is src/catalogue.py
+# The disease catalogue on its own, with no LangChain or PDF imports, so the
+# knowledge snapshot (and the batch triage workers that build one) load fast.
+import json
+import logging
+from pathlib import Path
+
+logger = logging.getLogger(__name__)
+
+MEDICAL_DISEASE_FILE = "Data/Medbook-home3/medical_disease.json"
+
+
+def disease_catalogue(data):
+    """Diseases from the parsed medical disease JSON, keyed by lowercased name"""
+    disease_data = {}
+    for disease in data.get('diseases', []):
+        name = disease.get('name', '').lower()
+        disease_data[name] = disease
+    return disease_data
+
+def load_medical_disease_data(file_path=MEDICAL_DISEASE_FILE):
+    """Load and process the medical disease JSON data"""
+    try:
+        # Construct absolute path
+        abs_path = Path(__file__).parent.parent / file_path
+        
+        with open(abs_path, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+        
+        # Process the data into a more usable format
+        disease_data = disease_catalogue(data)
+        
+        logger.info(f"Successfully loaded {len(disease_data)} diseases from JSON")
+        return disease_data
+    
+    except Exception as e:
+        logger.error(f"Failed to load medical disease data: {str(e)}")
+        return {}
@@ -0,0 +1,150 @@
+#this file is src/deadline.py
+import asyncio
+import logging
+import os
+import queue
+import time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeout
+from contextvars import ContextVar, copy_context
+
+logger = logging.getLogger(__name__)
+
+# End-to-end budget for one /get request
+REQUEST_DEADLINE_MS = int(os.environ.get("REQUEST_DEADLINE_MS", 3500))
+# Upper bound per stage; a stage also never gets more than what is left overall
+STAGE_BUDGETS_MS = {
+    "retrieval": int(os.environ.get("RETRIEVAL_BUDGET_MS", 800)),
+    "generation": int(os.environ.get("GENERATION_BUDGET_MS", 2500)),
+    "translation": int(os.environ.get("TRANSLATION_BUDGET_MS", 800)),
+}
+# Below this a remote call is not even started
+MIN_REMOTE_MS = int(os.environ.get("MIN_REMOTE_MS", 250))
+# End-to-end budget for a streamed answer (/get_stream); each token still waits at most its stage budget
+STREAM_DEADLINE_MS = int(os.environ.get("STREAM_DEADLINE_MS", 20000))
+
+_current = ContextVar("deadline", default=None)
+_stage_pool = ThreadPoolExecutor(max_workers=32, thread_name_prefix="deadline-stage")
+
+
+class Deadline:
+    """Per-request time budget, shared by every stage of the chat pipeline.
+
+    Entering the deadline makes it the current one for the request, so deeper
+    calls (the retriever, HFWrapper._call, translate_text) can size their
+    own waits with stage_budget_ms() without it being passed down. run() and
+    arun() give a stage at most its budget and return the caller's cheaper
+    fallback as soon as that runs out, instead of waiting for the remote call
+    to fail on its own.
+    """
+
+    def __init__(self, budget_ms=REQUEST_DEADLINE_MS, budgets=None):
+        self.started = time.monotonic()
+        self.expires = self.started + budget_ms / 1000
+        self.budgets = {**STAGE_BUDGETS_MS, **(budgets or {})}
+        self.degraded = []
+        self._token = None
+
+    def remaining_ms(self):
+        return max(0.0, (self.expires - time.monotonic()) * 1000)
+
+    def expired(self):
+        return self.remaining_ms() <= 0
+
+    def budget_ms(self, stage):
+        return min(self.remaining_ms(), self.budgets.get(stage, float("inf")))
+
+    def allows(self, stage, min_ms=MIN_REMOTE_MS):
+        return self.budget_ms(stage) >= min_ms
+
+    def degrade(self, stage, reason):
+        logger.warning(f"{stage} {reason} with {self.remaining_ms():.0f}ms left, degrading")
+        self.degraded.append(stage)
+
+    def run(self, stage, fn, *args, fallback):
+        """fn(*args) within the stage budget, else fallback()"""
+        if not self.allows(stage):
+            self.degrade(stage, "skipped")
+            return fallback()
+        future = _stage_pool.submit(copy_context().run, fn, *args)
+        try:
+            return future.result(timeout=self.budget_ms(stage) / 1000)
+        except FutureTimeout:
+            # The call keeps running in the background; its result is dropped
+            self.degrade(stage, "timed out")
+            return fallback()
+
+    def stream(self, stage, iterable):
+        """Yield from iterable while the budget lasts.
+
+        The iterable is consumed on a pool thread (with this request's
+        context), and each wait for its next item gets at most the stage's
+        budget, so a stalled upstream cannot hold the caller past the
+        deadline. On a cut the stage is marked degraded and the stream just
+        ends; errors from the iterable are re-raised here.
+        """
+        items = queue.Queue()
+        end = object()
+        stopped = []
+
+        def produce():
+            try:
+                for item in iterable:
+                    if stopped:
+                        break
+                    items.put((item, None))
+            except Exception as e:
+                items.put((end, e))
+                return
+            items.put((end, None))
+
+        _stage_pool.submit(copy_context().run, produce)
+        try:
+            while True:
+                wait_ms = self.budget_ms(stage)
+                try:
+                    if wait_ms <= 0:
+                        raise queue.Empty
+                    item, error = items.get(timeout=wait_ms / 1000)
+                except queue.Empty:
+                    self.degrade(stage, "timed out")
+                    return
+                if error is not None:
+                    raise error
+                if item is end:
+                    return
+                yield item
+        finally:
+            stopped.append(True)
+
+    async def arun(self, stage, awaitable, fallback):
+        """Await within the stage budget, else fallback()"""
+        if not self.allows(stage):
+            if hasattr(awaitable, "close"):
+                awaitable.close()
+            self.degrade(stage, "skipped")
+            return fallback()
+        try:
+            return await asyncio.wait_for(awaitable, timeout=self.budget_ms(stage) / 1000)
+        except asyncio.TimeoutError:
+            self.degrade(stage, "timed out")
+            return fallback()
+
+    def __enter__(self):
+        self._token = _current.set(self)
+        return self
+
+    def __exit__(self, *exc):
+        _current.reset(self._token)
+        return False
+
+
+def current_deadline():
+    return _current.get()
+
+
+def stage_budget_ms(stage, default_ms):
+    """Budget for stage under the current request's deadline, or default_ms outside a request"""
+    deadline = _current.get()
+    if deadline is None:
+        return default_ms
+    return min(default_ms, deadline.budget_ms(stage))
@@ -0,0 +1,202 @@
+#this file is src/disease_index.py
+import numpy as np
+from scipy import sparse
+
+from src.lexicon import SYMPTOM_KEYWORDS, LOCATIONS, ACTIVITY_PATTERNS
+from src.matcher import KeywordMatcher
+
+SYMPTOM_WEIGHT = 3
+SEXUAL_TRANSMISSION_WEIGHT = 5
+ENDEMIC_LOCATION_WEIGHT = 4
+MAX_CONDITIONS = 5
+# A direct match on symptoms alone needs at least this many of a disease's symptoms
+MIN_SYMPTOM_MATCHES = 2
+
+
+class DiseaseIndex:
+    """The disease catalogue as a sparse disease x feature matrix.
+
+    Features are the symptom labels, transmission routes and risk regions of
+    the lexicons. Entry (d, f) is 1 when the feature occurs in disease d's
+    stringified symptoms, how_contracted or high_risk_areas list - the same
+    substring test the per-request loop used to run - so a context becomes a
+    weighted feature vector (3 per symptom, 5 for sexual transmission, 4 per
+    endemic location when travelling) and scoring is one sparse product.
+    score_many() stacks several contexts into one product.
+    """
+
+    def __init__(self, diseases):
+        self.diseases = diseases
+        self.names = list(diseases)
+        self.features = ([('symptom', s) for s in SYMPTOM_KEYWORDS]
+                         + [('route', r) for r in ACTIVITY_PATTERNS]
+                         + [('region', l) for l in LOCATIONS])
+        self.feature_ids = {feature: i for i, feature in enumerate(self.features)}
+
+        rows, cols = [], []
+        for ordinal, data in enumerate(diseases.values()):
+            texts = {
+                'symptom': str(data.get('symptoms', [])).lower(),
+                'route': str(data.get('how_contracted', [])).lower(),
+                'region': str(data.get('high_risk_areas', [])).lower(),
+            }
+            for col, (kind, label) in enumerate(self.features):
+                if label in texts[kind]:
+                    rows.append(ordinal)
+                    cols.append(col)
+
+        self.matrix = sparse.csr_matrix(
+            (np.ones(len(rows), dtype=np.float32), (rows, cols)),
+            shape=(len(self.names), len(self.features)))
+        self._build_name_matcher()
+
+    def _build_name_matcher(self):
+        """One automaton over space-stripped names, aliases and symptom phrases.
+
+        It runs over the space-stripped message; a hit whose original span
+        equals the keyword is also an exact hit. So one pass answers all three
+        tiers of the direct match: exact name, name ignoring spaces and
+        symptom overlap. Keywords that stripping would change at the edges
+        are few and checked with a plain substring test instead.
+        """
+        self._name_matcher = KeywordMatcher(word_boundary=False)
+        self._unindexed = []
+        self._symptom_diseases = []
+        symptom_ids = {}
+
+        def add(keyword, value):
+            if keyword and keyword == keyword.strip(' '):
+                self._name_matcher.add(keyword.replace(' ', ''), value)
+            else:
+                self._unindexed.append(value)
+
+        for ordinal, (name, data) in enumerate(self.diseases.items()):
+            for alias in [name] + [a.lower() for a in data.get('aliases', [])]:
+                add(alias, ('name', ordinal, alias))
+            for symptom in data.get('symptoms', []):
+                symptom = symptom.lower()
+                if symptom not in symptom_ids:
+                    symptom_ids[symptom] = len(self._symptom_diseases)
+                    self._symptom_diseases.append([])
+                    add(symptom, ('symptom', symptom_ids[symptom], symptom))
+                # Repeated symptoms in one disease count once per listing, as before
+                self._symptom_diseases[symptom_ids[symptom]].append(ordinal)
+        self._name_matcher.build()
+
+    def match(self, text):
+        """Disease named (or aliased) in text, else the one sharing the most symptoms with it"""
+        text = text.lower()
+        positions = [i for i, char in enumerate(text) if char != ' ']
+        stripped = ''.join(text[i] for i in positions)
+
+        exact = loose = None
+        symptoms = set()
+        hits = ((positions[start], positions[end - 1] + 1, value)
+                for start, end, value in self._name_matcher.find(stripped))
+        unindexed = ((None, None, value) for value in self._unindexed)
+
+        for start, end, (kind, key, keyword) in (*hits, *unindexed):
+            if start is None:
+                is_exact = keyword in text
+                is_loose = keyword.replace(' ', '') in stripped
+            else:
+                is_exact = text[start:end] == keyword
+                is_loose = True
+            if kind == 'name':
+                if is_exact and (exact is None or key < exact):
+                    exact = key
+                if is_loose and (loose is None or key < loose):
+                    loose = key
+            elif is_exact:
+                symptoms.add(key)
+
+        if exact is not None:
+            return self.diseases[self.names[exact]]
+        if loose is not None:
+            return self.diseases[self.names[loose]]
+
+        counts = np.zeros(len(self.names), dtype=np.int64)
+        for symptom in symptoms:
+            np.add.at(counts, self._symptom_diseases[symptom], 1)
+        if len(counts) and counts.max() >= MIN_SYMPTOM_MATCHES:
+            # argmax keeps the first disease on ties, as max() over the dict did
+            return self.diseases[self.names[int(np.argmax(counts))]]
+        return None
+
+    def __len__(self):
+        return len(self.names)
+
+    def _features(self, context):
+        """Weighted (feature id, weight) pairs for an analysis context"""
+        pairs = [(self.feature_ids[('symptom', s)], SYMPTOM_WEIGHT)
+                 for s in context['symptoms'] if ('symptom', s) in self.feature_ids]
+        if 'sexual' in context['activities']:
+            pairs.append((self.feature_ids[('route', 'sexual')], SEXUAL_TRANSMISSION_WEIGHT))
+        if 'travel' in context['activities']:
+            pairs.extend((self.feature_ids[('region', l)], ENDEMIC_LOCATION_WEIGHT)
+                         for l in context['locations'] if ('region', l) in self.feature_ids)
+        return pairs
+
+    def vectorize(self, contexts):
+        """Feature x context matrix of weights, one column per context"""
+        rows, cols, weights = [], [], []
+        for col, context in enumerate(contexts):
+            for row, weight in self._features(context):
+                rows.append(row)
+                cols.append(col)
+                weights.append(weight)
+        # Duplicate (row, col) pairs are summed, as the loop counted repeated hits
+        return sparse.csr_matrix(
+            (np.asarray(weights, dtype=np.float32), (rows, cols)),
+            shape=(len(self.features), len(contexts)))
+
+    def _top(self, scores, k):
+        """Ordinals of the k best scores, ordered like a stable sort on capped confidence"""
+        hits = np.flatnonzero(scores > 0)
+        if len(hits) == 0:
+            return hits
+        # Confidence is min(score / 10, 1), so ties on the capped score keep catalogue order
+        key = -np.minimum(scores[hits], 10).astype(np.int64) * len(self.names) + hits
+        if len(hits) > k:
+            keep = np.argpartition(key, k - 1)[:k]
+            hits, key = hits[keep], key[keep]
+        return hits[np.argsort(key)]
+
+    def _condition(self, ordinal, context, score):
+        name = self.names[ordinal]
+        data = self.diseases[name]
+        row = self.matrix.indices[self.matrix.indptr[ordinal]:self.matrix.indptr[ordinal + 1]]
+        present = {self.features[col] for col in row}
+
+        matched_symptoms = [s for s in context['symptoms'] if ('symptom', s) in present]
+        matched_factors = []
+        if 'sexual' in context['activities'] and ('route', 'sexual') in present:
+            matched_factors.append('sexual transmission')
+        if 'travel' in context['activities']:
+            matched_factors.extend(f'endemic in {l}' for l in context['locations'] if ('region', l) in present)
+
+        return {
+            'disease': name,
+            'confidence': min(score / 10, 1.0),
+            'score': score,
+            'matched_symptoms': matched_symptoms,
+            'matched_factors': matched_factors,
+            'description': data.get('description', ''),
+            'treatment': data.get('treatment', [])
+        }
+
+    def score_many(self, contexts, k=MAX_CONDITIONS):
+        """Top-k scored conditions for each context, best first"""
+        if not contexts or not self.names:
+            return [[] for _ in contexts]
+        scores = np.asarray((self.matrix @ self.vectorize(contexts)).todense())
+        results = []
+        for col, context in enumerate(contexts):
+            column = np.rint(scores[:, col]).astype(np.int64)
+            results.append([self._condition(int(ordinal), context, int(column[ordinal]))
+                            for ordinal in self._top(column, k)])
+        return results
+
+    def score(self, context, k=MAX_CONDITIONS):
+        """Top-k scored conditions for an analysis context, best first"""
+        return self.score_many([context], k)[0]
@@ -0,0 +1,130 @@
+#this file is src/embedding_cache.py
+import hashlib
+import json
+import logging
+import os
+import re
+import threading
+from contextlib import contextmanager
+from pathlib import Path
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+try:
+    import fcntl
+except ImportError:  # Windows: single writer assumed
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+EMBEDDING_CACHE_DIR = os.environ.get("EMBEDDING_CACHE_DIR", "embedding_cache")
+KEY_BYTES = 16
+
+
+class CachedEmbeddings(Embeddings):
+    """Disk-backed cache in front of a document embedding model.
+
+    Vectors are keyed by a hash of the model name plus the chunk text and
+    appended to a float32 file that is read through a memory map; index.bin
+    holds one fixed-size key per row. Both files are append-only and shared
+    by every process using the same cache directory, so store_index.py
+    re-runs, local index rebuilds and experiments never embed the same text
+    twice. Queries are passed straight through: they are rarely repeated
+    verbatim and should not be persisted to disk.
+    """
+
+    def __init__(self, embeddings, cache_dir=EMBEDDING_CACHE_DIR):
+        self.embeddings = embeddings
+        self.model_name = getattr(embeddings, "model_name", type(embeddings).__name__)
+        self.path = Path(cache_dir) / re.sub(r"[^A-Za-z0-9_.-]+", "_", self.model_name)
+        self.path.mkdir(parents=True, exist_ok=True)
+
+        self._index_path = self.path / "index.bin"
+        self._vectors_path = self.path / "vectors.f32"
+        self._meta_path = self.path / "meta.json"
+        self._lock_path = self.path / ".lock"
+
+        self._rows = {}
+        self._row_count = 0
+        self._vectors = None
+        self._thread_lock = threading.Lock()
+
+        self.dimension = None
+        self._refresh()
+        logger.info(f"Embedding cache at {self.path} holds {self._row_count} vectors")
+
+    def __len__(self):
+        return self._row_count
+
+    def _key(self, text):
+        return hashlib.sha256(f"{self.model_name}\0{text}".encode("utf-8")).digest()[:KEY_BYTES]
+
+    def _refresh(self):
+        """Pick up rows appended since the last read, by this or another process"""
+        if self.dimension is None and self._meta_path.exists():
+            with open(self._meta_path, encoding="utf-8") as f:
+                self.dimension = json.load(f)["dimension"]
+        if not self._index_path.exists() or self.dimension is None:
+            return
+        with open(self._index_path, "rb") as f:
+            f.seek(self._row_count * KEY_BYTES)
+            tail = f.read()
+        for offset in range(0, len(tail) - len(tail) % KEY_BYTES, KEY_BYTES):
+            self._rows.setdefault(tail[offset:offset + KEY_BYTES], self._row_count)
+            self._row_count += 1
+        if self._row_count and (self._vectors is None or len(self._vectors) != self._row_count):
+            self._vectors = np.memmap(self._vectors_path, dtype=np.float32, mode="r",
+                                      shape=(self._row_count, self.dimension))
+
+    @contextmanager
+    def _file_lock(self):
+        with open(self._lock_path, "w") as lock:
+            if fcntl:
+                fcntl.flock(lock, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                if fcntl:
+                    fcntl.flock(lock, fcntl.LOCK_UN)
+
+    def _append(self, keys, vectors):
+        vectors = np.asarray(vectors, dtype=np.float32)
+        with self._file_lock():
+            if self.dimension is None:
+                self.dimension = vectors.shape[1]
+                with open(self._meta_path, "w", encoding="utf-8") as f:
+                    json.dump({"model_name": self.model_name, "dimension": self.dimension}, f)
+            self._refresh()
+
+            new = [i for i, key in enumerate(keys) if key not in self._rows]
+            if not new:
+                return
+            row_bytes = self.dimension * 4
+            with open(self._vectors_path, "ab") as f:
+                # Drop any vector written by a writer that died before its index entry
+                f.truncate(self._row_count * row_bytes)
+                f.write(vectors[new].tobytes())
+            with open(self._index_path, "ab") as f:
+                f.write(b"".join(keys[i] for i in new))
+            self._refresh()
+
+    def embed_documents(self, texts):
+        keys = [self._key(text) for text in texts]
+        with self._thread_lock:
+            if any(key not in self._rows for key in keys):
+                self._refresh()
+
+            missing = {}
+            for i, key in enumerate(keys):
+                if key not in self._rows and key not in missing:
+                    missing[key] = i
+            if missing:
+                logger.info(f"Embedding cache: {len(texts) - len(missing)} hits, {len(missing)} misses")
+                computed = self.embeddings.embed_documents([texts[i] for i in missing.values()])
+                self._append(list(missing), computed)
+
+            return [self._vectors[self._rows[key]].tolist() for key in keys]
+
+    def embed_query(self, text):
+        return self.embeddings.embed_query(text)
@@ -0,0 +1,245 @@
+#this file is src/fuzzy.py
+import json
+import logging
+import os
+import re
+from pathlib import Path
+
+from src.lexicon import LEXICONS, SUMMARY_LEXICONS, SYMPTOM_KEYWORDS
+from src.lexical_index import STOPWORDS, lexical_index_paths
+from src.matcher import KeywordMatcher
+
+logger = logging.getLogger(__name__)
+
+# 0 turns spelling correction off
+FUZZY_MAX_DISTANCE = int(os.environ.get("FUZZY_MAX_DISTANCE", 2))
+# Shorter tokens are too ambiguous to correct ("hot", "ake")
+FUZZY_MIN_LENGTH = 4
+WORD_PATTERN = re.compile(r"[a-z]+")
+# Written into the knowledge base by store_index.py: the common English words
+# ("sweet", "lever", "never") that would otherwise be rewritten into symptoms
+GUARD_WORDS_FILE = "speller_guard_words.txt"
+# wordfreq Zipf cut-off for "common": about once per million words
+GUARD_MIN_ZIPF = 3.0
+
+
+def deletes(word, distance):
+    """Every string obtained from word by removing up to distance characters"""
+    found = {word}
+    frontier = {word}
+    for _ in range(distance):
+        frontier = {w[:i] + w[i + 1:] for w in frontier for i in range(len(w))}
+        found |= frontier
+    return found
+
+
+def edit_distance(a, b, max_distance):
+    """Optimal string alignment distance, or max_distance + 1 once it is exceeded"""
+    if abs(len(a) - len(b)) > max_distance:
+        return max_distance + 1
+    previous2 = None
+    previous = list(range(len(b) + 1))
+    for i in range(1, len(a) + 1):
+        current = [i] + [0] * len(b)
+        for j in range(1, len(b) + 1):
+            cost = a[i - 1] != b[j - 1]
+            current[j] = min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + cost)
+            if previous2 is not None and i > 1 and j > 1 and a[i - 1] == b[j - 2] and a[i - 2] == b[j - 1]:
+                current[j] = min(current[j], previous2[j - 2] + 1)
+        if min(current) > max_distance:
+            return max_distance + 1
+        previous2, previous = previous, current
+    return previous[-1]
+
+
+class SymSpellIndex:
+    """Symmetric-delete spelling index over the symptom vocabulary.
+
+    Every term's deletions (up to max_distance characters) are precomputed,
+    so a lookup only generates the deletions of the typed token and probes a
+    dict: the cost depends on the token length, not on the vocabulary size.
+    Tokens that are known words (the knowledge base's guard words,
+    stopwords, lexicon and catalogue words, its BM25 vocabulary) are never
+    corrected, so "never" is not read as "fever" nor "sweet" as "sweat". A
+    token with two equally close terms is left alone, and with a symptom
+    matcher a correction is only kept if the corrected word ends up inside a
+    symptom lexicon match. Adjacent tokens are also tried joined, which fixes
+    "head ake".
+    """
+
+    def __init__(self, terms, known_words=(), max_distance=FUZZY_MAX_DISTANCE, min_length=FUZZY_MIN_LENGTH,
+                 matcher=None):
+        self.max_distance = max_distance
+        self.min_length = min_length
+        self.matcher = matcher
+        self.terms = {t for t in terms if len(t) >= min_length}
+        self.known_words = set(known_words) | self.terms
+        self._deletes = {}
+        for term in sorted(self.terms):
+            for variant in deletes(term, max_distance):
+                self._deletes.setdefault(variant, []).append(term)
+
+    def _distance_for(self, word):
+        # One edit in a short word is already a fifth of it; two only from 7 letters
+        return min(self.max_distance, 1 if len(word) <= 6 else 2)
+
+    def is_known(self, word):
+        return word in self.known_words
+
+    def lookup(self, word):
+        """The single closest symptom term within the edit budget for word, or None"""
+        if self.max_distance <= 0 or word in self.terms:
+            return None
+        limit = self._distance_for(word)
+        best, closest = limit + 1, set()
+        for variant in deletes(word, limit):
+            for term in self._deletes.get(variant, ()):
+                distance = edit_distance(word, term, limit)
+                if distance < best:
+                    best, closest = distance, {term}
+                elif distance == best:
+                    closest.add(term)
+        # A tie is a guess
+        return next(iter(closest)) if len(closest) == 1 else None
+
+    def _correct_word(self, word):
+        if self.is_known(word) or len(word) < self.min_length:
+            return None
+        return self.lookup(word)
+
+    def correct(self, text):
+        """Text with misspelt symptom words replaced, and the (typed, corrected) pairs"""
+        candidates = self._candidates(text)
+        if not candidates:
+            return text, []
+        corrected, spans = self._apply(text, candidates)
+        if self.matcher is not None:
+            hits = [(start, end) for start, end, _ in self.matcher.find(corrected)]
+            candidates = [candidate for candidate, (start, end) in zip(candidates, spans)
+                          if any(hit_start <= start and end <= hit_end for hit_start, hit_end in hits)]
+            if not candidates:
+                return text, []
+            corrected, _ = self._apply(text, candidates)
+        return corrected, [(text[start:end], term) for start, end, term in candidates]
+
+    @staticmethod
+    def _apply(text, candidates):
+        """text with the (start, end, term) replacements made, and each term's span in the result"""
+        pieces, spans = [], []
+        last = length = 0
+        for start, end, term in candidates:
+            pieces += [text[last:start], term]
+            length += start - last
+            spans.append((length, length + len(term)))
+            length += len(term)
+            last = end
+        pieces.append(text[last:])
+        return "".join(pieces), spans
+
+    def _candidates(self, text):
+        words = list(WORD_PATTERN.finditer(text))
+        single = [self._correct_word(w.group()) for w in words]
+        candidates = []
+        i = 0
+        while i < len(words):
+            start, end, term = words[i].start(), words[i].end(), single[i]
+            # A word split in two ("head ake") when neither half fixes on its own
+            if term is None and i + 1 < len(words) and single[i + 1] is None:
+                first, second = words[i].group(), words[i + 1].group()
+                unknown = not (self.is_known(first) and self.is_known(second))
+                if unknown and len(first) > 1 and len(second) > 1 and text[end:words[i + 1].start()].isspace():
+                    joined = first + second
+                    term = joined if joined in self.terms else self.lookup(joined)
+                    if term:
+                        end = words[i + 1].end()
+                        i += 1
+            if term:
+                candidates.append((start, end, term))
+            i += 1
+        return candidates
+
+    def __len__(self):
+        return len(self.terms)
+
+
+def _words(value):
+    return WORD_PATTERN.findall(str(value).lower())
+
+
+def _symptom_vocabulary():
+    """The speller's terms and the symptom matcher its corrections must land in"""
+    terms = set()
+    matcher = KeywordMatcher(word_boundary=True)
+    for label, keywords in SYMPTOM_KEYWORDS.items():
+        for keyword in [label, *keywords]:
+            terms.update(_words(keyword))
+            matcher.add(keyword, label)
+    return terms, matcher.build()
+
+
+def build_guard_words(knowbase_path, max_distance=FUZZY_MAX_DISTANCE, min_zipf=GUARD_MIN_ZIPF):
+    """Write the common English words the symptom speller would rewrite; returns how many.
+
+    Taken from wordfreq at build time rather than shipped, and trimmed to
+    the words the guard actually needs: those an unguarded speller would
+    turn into a symptom match ("sweet" -> "sweat"), a few hundred out of
+    the ~30k common words.
+    """
+    try:
+        from wordfreq import iter_wordlist, zipf_frequency
+    except ImportError:
+        logger.warning("wordfreq is not installed; the speller is guarded by the app's own words only")
+        return 0
+    terms, matcher = _symptom_vocabulary()
+    speller = SymSpellIndex(terms, max_distance=max_distance, matcher=matcher)
+    guarded = []
+    # Most frequent first, so the walk stops at the cut-off
+    for word in iter_wordlist("en"):
+        if zipf_frequency(word, "en") < min_zipf:
+            break
+        if word.isalpha() and speller.correct(word)[1]:
+            guarded.append(word)
+    with open(Path(knowbase_path) / GUARD_WORDS_FILE, "w", encoding="utf-8") as f:
+        f.write("\n".join(sorted(guarded)) + "\n")
+    return len(guarded)
+
+
+def _read_words(path):
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return {line.strip() for line in f if line.strip()}
+    except FileNotFoundError:
+        return set()
+
+
+def build_symptom_speller(diseases=None, knowbase_path=None, max_distance=FUZZY_MAX_DISTANCE):
+    """SymSpellIndex over the symptom lexicon, guarded by every word the app knows"""
+    terms, matcher = _symptom_vocabulary()
+
+    known = set(STOPWORDS)
+    for lexicons in (LEXICONS, SUMMARY_LEXICONS):
+        for entries in lexicons.values():
+            for label, keywords in entries.items():
+                known.update(_words(label))
+                for keyword in keywords:
+                    known.update(_words(keyword))
+    for name, data in (diseases or {}).items():
+        known.update(_words(name))
+        known.update(_words(json.dumps(data)))
+
+    if knowbase_path is not None:
+        guard_words = _read_words(Path(knowbase_path) / GUARD_WORDS_FILE)
+        if not guard_words:
+            logger.warning(f"No {GUARD_WORDS_FILE} in {knowbase_path}; run store_index.py so common "
+                           f"words are not corrected into symptoms")
+        known |= guard_words
+        vocab_path = lexical_index_paths(knowbase_path)["vocab"]
+        try:
+            with open(vocab_path, "r", encoding="utf-8") as f:
+                known.update(term for term in json.load(f) if term.isalpha())
+        except FileNotFoundError:
+            pass
+
+    speller = SymSpellIndex(terms, known, max_distance=max_distance, matcher=matcher)
+    logger.info(f"Spelling index over {len(speller)} symptom terms, {len(known)} known words")
+    return speller
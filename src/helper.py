@@ -1,64 +1,126 @@
 #this is file src/helper.py
-from langchain_community.document_loaders import PyPDFLoader, DirectoryLoader
 from langchain.text_splitter import RecursiveCharacterTextSplitter
 #from langchain_huggingface import HuggingFaceEmbeddings
 from langchain_community.embeddings import HuggingFaceEmbeddings
+from langchain_core.documents import Document
+from src.embedding_cache import CachedEmbeddings, EMBEDDING_CACHE_DIR
+from src.catalogue import disease_catalogue, load_medical_disease_data, MEDICAL_DISEASE_FILE
+from pypdf import PdfReader
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice
+from collections import deque
 import logging
-import json
+import hashlib
+import os
 from pathlib import Path
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+CHUNK_SIZE = 500
+CHUNK_OVERLAP = 20
+PAGES_PER_TASK = 25
 
-#Extract Data from PDF files
-def load_pdf_file(data_path):
-    """Load medical PDFs with enhanced error recovery"""
-    try:
-        loader = DirectoryLoader(
-            path=data_path,
-            glob="*.pdf",
-            loader_cls=PyPDFLoader,
-            show_progress=True    # Visual loading indicator
-        )
-        documents = loader.load()
-        logger.info(f"Successfully loaded {len(documents)} medical documents")
-        return documents
-    except Exception as e:
-        logger.error(f"Failed to load PDFs: {str(e)}")
-        return []
-    
-def load_medical_disease_data(file_path="Data/Medbook-home3/medical_disease.json"):
-    """Load and process the medical disease JSON data"""
-    try:
-        # Construct absolute path
-        abs_path = Path(__file__).parent.parent / file_path
-        
-        with open(abs_path, 'r', encoding='utf-8') as f:
-            data = json.load(f)
-        
-        # Process the data into a more usable format
-        disease_data = {}
-        for disease in data.get('diseases', []):
-            name = disease.get('name', '').lower()
-            disease_data[name] = disease
-        
-        logger.info(f"Successfully loaded {len(disease_data)} diseases from JSON")
-        return disease_data
-    
-    except Exception as e:
-        logger.error(f"Failed to load medical disease data: {str(e)}")
-        return {}
+
+def list_pdf_files(data_path):
+    """Return the PDFs under data_path in a stable order"""
+    return sorted(str(p) for p in Path(data_path).glob("*.pdf"))
+
+def load_pdf(file_path, start=0, end=None):
+    """Load pages [start, end) of a single PDF as one Document per page"""
+    reader = PdfReader(file_path)
+    end = len(reader.pages) if end is None else min(end, len(reader.pages))
+    return [
+        Document(page_content=reader.pages[i].extract_text(), metadata={'source': file_path, 'page': i})
+        for i in range(start, end)
+    ]
+
+def file_sha256(file_path):
+    """Content hash of a source file, used to skip unchanged PDFs on re-ingestion"""
+    digest = hashlib.sha256()
+    with open(file_path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+def chunk_ids(text_chunks, seen=None):
+    """Content-hashed ids for chunks: identical text from the same source keeps its id across runs.
+
+    Pass the same `seen` dict for consecutive batches of one file so repeated
+    text gets the same -n suffixes as if the file were hashed in one go.
+    """
+    ids = []
+    seen = {} if seen is None else seen
+    for chunk in text_chunks:
+        source = chunk.metadata.get('source', '')
+        key = hashlib.sha256(f"{source}\0{chunk.page_content}".encode('utf-8')).hexdigest()[:32]
+        n = seen.get(key, 0)
+        seen[key] = n + 1
+        ids.append(key if n == 0 else f"{key}-{n}")
+    return ids
     
 # Split the Data into Text Chunks
 def text_split(extracted_data):
-    text_splitter = RecursiveCharacterTextSplitter(chunk_size=500, chunk_overlap=20)
+    text_splitter = RecursiveCharacterTextSplitter(chunk_size=CHUNK_SIZE, chunk_overlap=CHUNK_OVERLAP)
     text_chunks = text_splitter.split_documents(extracted_data)
 
     return text_chunks
 
 # Download the Embeddings from HuggingFace
-def download_huggingface_embeddings():
+def download_huggingface_embeddings(cache_dir=EMBEDDING_CACHE_DIR):
+    """MiniLM embeddings behind the persistent chunk embedding cache (cache_dir=None disables it)"""
     embeddings=HuggingFaceEmbeddings(model_name='sentence-transformers/all-MiniLM-L6-v2')
+    if cache_dir:
+        return CachedEmbeddings(embeddings, cache_dir)
     return embeddings
-    
+
+def _load_and_split_pages(task):
+    file_path, start, end = task
+    return text_split(load_pdf(file_path, start, end))
+
+def ingest_workers(workers=None):
+    """Worker count for parallel ingestion: explicit value, then INGEST_WORKERS, then all cores"""
+    if workers is None:
+        workers = int(os.environ.get("INGEST_WORKERS", 0)) or os.cpu_count() or 1
+    return max(1, workers)
+
+def iter_pdf_chunks(file_paths, workers=None, pages_per_task=PAGES_PER_TASK, max_pending=None):
+    """Stream (file_path, chunks) per page range of each PDF, in order.
+
+    Page ranges are parsed and split on a process pool, but at most
+    max_pending ranges (default: two per worker) are in flight at once, so a
+    slow consumer (the embedder) holds the parsers back instead of results
+    piling up in memory. Splitting is per page, so the chunks are exactly
+    those of a serial run.
+    """
+    workers = ingest_workers(workers)
+    tasks = _page_range_tasks(file_paths, pages_per_task)
+
+    if workers == 1:
+        for task in tasks:
+            yield task[0], _load_and_split_pages(task)
+        return
+
+    max_pending = max_pending or 2 * workers
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        pending = deque()
+        for task in tasks:
+            pending.append((task[0], pool.submit(_load_and_split_pages, task)))
+            if len(pending) >= max_pending:
+                file_path, future = pending.popleft()
+                yield file_path, future.result()
+        while pending:
+            file_path, future = pending.popleft()
+            yield file_path, future.result()
+
+def _page_range_tasks(file_paths, pages_per_task):
+    for file_path in file_paths:
+        page_count = len(PdfReader(file_path).pages)
+        for start in range(0, max(page_count, 1), pages_per_task):
+            yield file_path, start, start + pages_per_task
+
+def batched(iterable, size):
+    """Yield lists of up to size items from iterable without materializing it"""
+    iterator = iter(iterable)
+    while batch := list(islice(iterator, size)):
+        yield batch
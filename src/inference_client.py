@@ -0,0 +1,255 @@
+#this file is src/inference_client.py
+import json
+import logging
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from src.deadline import stage_budget_ms
+
+logger = logging.getLogger(__name__)
+
+HF_MODEL = os.environ.get("HF_MODEL", "microsoft/BioGPT")
+# Point at a local stub server to exercise timeouts and the breaker without the real API
+HF_INFERENCE_URL = os.environ.get("HF_INFERENCE_URL", f"https://api-inference.huggingface.co/models/{HF_MODEL}")
+HF_CONNECT_TIMEOUT_S = float(os.environ.get("HF_CONNECT_TIMEOUT_S", 3.05))
+HF_READ_TIMEOUT_S = float(os.environ.get("HF_READ_TIMEOUT_S", 20))
+# Keep-alive connections held open to the inference endpoint
+HF_POOL_SIZE = int(os.environ.get("HF_POOL_SIZE", 16))
+# Send a second, identical request if the first has not answered after this long; 0 disables hedging
+HF_HEDGE_AFTER_MS = int(os.environ.get("HF_HEDGE_AFTER_MS", 0))
+# Consecutive failures that open the breaker, and how long it stays open before a trial call
+BREAKER_FAILURE_THRESHOLD = int(os.environ.get("BREAKER_FAILURE_THRESHOLD", 5))
+BREAKER_RESET_S = float(os.environ.get("BREAKER_RESET_S", 30))
+
+
+class CircuitOpenError(RuntimeError):
+    """The remote is considered down; the call was not attempted"""
+
+
+def _unhealthy(error):
+    """Whether a failed call counts against the breaker"""
+    # A rejected request (bad prompt, auth) says nothing about the endpoint's health
+    if isinstance(error, requests.HTTPError) and error.response is not None:
+        status = error.response.status_code
+        return status >= 500 or status == 429
+    return True
+
+
+def _generated_text(data):
+    if isinstance(data, list):
+        data = data[0]
+    return data["generated_text"]
+
+
+def _sse_tokens(response):
+    """Token texts from a TGI server-sent-event stream, as each event arrives"""
+    for line in response.iter_lines(chunk_size=None, decode_unicode=True):
+        if not line or not line.startswith("data:"):
+            continue
+        event = json.loads(line[len("data:"):])
+        if "error" in event:
+            raise RuntimeError(event["error"])
+        token = event.get("token") or {}
+        if not token.get("special"):
+            yield token.get("text")
+
+
+class CircuitBreaker:
+    """Closed / open / half-open breaker around one remote dependency.
+
+    After failure_threshold consecutive failures the breaker opens and
+    allow() refuses calls for reset_s, so callers go straight to their
+    fallback instead of each paying the failure latency. Once reset_s has
+    passed a single trial call is let through (half-open); its success closes
+    the breaker, its failure opens it for another reset_s, and any other
+    ending (settle()/release()) frees the slot for the next trial.
+    """
+
+    def __init__(self, failure_threshold=BREAKER_FAILURE_THRESHOLD, reset_s=BREAKER_RESET_S, name="remote"):
+        self.failure_threshold = failure_threshold
+        self.reset_s = reset_s
+        self.name = name
+        self.failures = 0
+        self.opened_at = None
+        self._trial = False
+        self._lock = threading.Lock()
+
+    @property
+    def state(self):
+        if self.opened_at is None:
+            return "closed"
+        if time.monotonic() - self.opened_at >= self.reset_s:
+            return "half-open"
+        return "open"
+
+    def allow(self):
+        with self._lock:
+            state = self.state
+            if state == "closed":
+                return True
+            if state == "half-open" and not self._trial:
+                self._trial = True
+                return True
+            return False
+
+    def record_success(self):
+        with self._lock:
+            if self.opened_at is not None:
+                logger.info(f"{self.name} circuit closed")
+            self.failures = 0
+            self.opened_at = None
+            self._trial = False
+
+    def release(self):
+        """End a call whose outcome says nothing about health (a rejected request, a cancellation)"""
+        with self._lock:
+            # Frees the half-open trial slot, so the next call can be the trial
+            self._trial = False
+
+    def settle(self, error):
+        """Record how a failed call ended: a failure if it points at the endpoint, else a release"""
+        if isinstance(error, Exception) and _unhealthy(error):
+            self.record_failure()
+        else:
+            self.release()
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            if self._trial or self.failures >= self.failure_threshold:
+                if self._trial or self.opened_at is None:
+                    logger.warning(f"{self.name} circuit open for {self.reset_s:.0f}s after {self.failures} failures")
+                self.opened_at = time.monotonic()
+                self._trial = False
+
+
+class PooledInferenceClient:
+    """Text generation against the HF inference API over a pooled session.
+
+    Connections are reused from a keep-alive pool, every request has explicit
+    connect and read timeouts (the read timeout also shrinks to what is left
+    of the request's generation budget), and a CircuitBreaker short-circuits
+    calls with CircuitOpenError while the endpoint is failing. With
+    hedge_after_ms set, a call still unanswered after that long is sent a
+    second time and the first success wins, which cuts the latency tail at the
+    cost of some duplicate load. Only the outcome of the call as a whole
+    counts towards the breaker.
+    """
+
+    def __init__(self, url=HF_INFERENCE_URL, token=None, connect_timeout_s=HF_CONNECT_TIMEOUT_S,
+                 read_timeout_s=HF_READ_TIMEOUT_S, pool_size=HF_POOL_SIZE, hedge_after_ms=HF_HEDGE_AFTER_MS,
+                 breaker=None):
+        self.url = url
+        self.connect_timeout_s = connect_timeout_s
+        self.read_timeout_s = read_timeout_s
+        self.hedge_after_ms = hedge_after_ms
+        self.breaker = breaker or CircuitBreaker(name="HF inference")
+        self.session = requests.Session()
+        # Retries would multiply the failure latency the breaker is there to cut
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size, max_retries=0)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+        if token:
+            self.session.headers["Authorization"] = f"Bearer {token}"
+        self._pool = ThreadPoolExecutor(max_workers=pool_size, thread_name_prefix="hf-inference")
+
+    def _timeout_s(self):
+        return stage_budget_ms("generation", self.read_timeout_s * 1000) / 1000
+
+    def _post(self, payload, timeout_s, stream=False):
+        response = self.session.post(self.url, json=payload, timeout=(self.connect_timeout_s, timeout_s),
+                                     stream=stream)
+        response.raise_for_status()
+        return response
+
+    def _generate(self, payload, timeout_s):
+        return _generated_text(self._post(payload, timeout_s).json())
+
+    def _hedged(self, payload, timeout_s):
+        deadline = time.monotonic() + timeout_s
+        pending = {self._pool.submit(self._generate, payload, timeout_s)}
+        hedge_at = time.monotonic() + self.hedge_after_ms / 1000
+        error = None
+        while pending:
+            hedging = len(pending) == 1 and error is None and hedge_at < deadline
+            wait_until = hedge_at if hedging else deadline
+            done, pending = wait(pending, timeout=max(0.0, wait_until - time.monotonic()),
+                                 return_when=FIRST_COMPLETED)
+            for future in done:
+                try:
+                    return future.result()
+                except Exception as e:
+                    error = e
+            if not done:
+                if time.monotonic() >= deadline:
+                    break
+                if hedging:
+                    pending.add(self._pool.submit(self._generate, payload, max(0.0, deadline - time.monotonic())))
+                    hedge_at = float("inf")
+        if error is not None and not pending:
+            raise error
+        raise requests.Timeout(f"no answer within {timeout_s:.2f}s")
+
+    def text_generation(self, prompt, max_new_tokens=300, temperature=0.7):
+        if not self.breaker.allow():
+            raise CircuitOpenError(f"{self.breaker.name} circuit is open")
+        payload = {"inputs": prompt, "parameters": {"max_new_tokens": max_new_tokens, "temperature": temperature,
+                                                    "return_full_text": False}}
+        timeout_s = self._timeout_s()
+        try:
+            if self.hedge_after_ms > 0:
+                text = self._hedged(payload, timeout_s)
+            else:
+                text = self._generate(payload, timeout_s)
+        except BaseException as e:
+            self.breaker.settle(e)
+            raise
+        self.breaker.record_success()
+        return text
+
+    def stream_generation(self, prompt, max_new_tokens=300, temperature=0.7):
+        """Yield generated text token by token from the endpoint's server-sent-event stream.
+
+        The read timeout bounds the wait for each token rather than the whole
+        answer. An endpoint that ignores `stream` and answers with a plain
+        JSON body yields its generated text as one chunk. Only a failure
+        before the first token counts against the breaker and reaches the
+        caller, and an answer without any text is such a failure; a stream
+        cut off later just ends.
+        """
+        if not self.breaker.allow():
+            raise CircuitOpenError(f"{self.breaker.name} circuit is open")
+        payload = {"inputs": prompt, "stream": True,
+                   "parameters": {"max_new_tokens": max_new_tokens, "temperature": temperature}}
+        started = False
+        try:
+            with self._post(payload, self._timeout_s(), stream=True) as response:
+                if response.headers.get("Content-Type", "").startswith("text/event-stream"):
+                    texts = _sse_tokens(response)
+                else:
+                    # The endpoint ignored `stream`: the whole answer in one JSON body
+                    texts = [_generated_text(response.json())]
+                for text in texts:
+                    if not text:
+                        continue
+                    if not started:
+                        started = True
+                        self.breaker.record_success()
+                    yield text
+            if not started:
+                raise RuntimeError("inference endpoint answered without any generated text")
+        except Exception as e:
+            if started:
+                logger.warning(f"Inference stream ended early: {e}")
+                return
+            self.breaker.settle(e)
+            raise
+        except BaseException as e:
+            if not started:
+                self.breaker.settle(e)
+            raise
@@ -0,0 +1,194 @@
+#this file is src/knowbase.py
+import json
+import logging
+import mmap
+import os
+import shutil
+from datetime import datetime
+from pathlib import Path
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+KNOWBASE_DIR = "full_medical_knowbase"
+KNOWBASE_FORMAT_VERSION = 1
+
+MANIFEST_FILE = "manifest.json"
+CHUNKS_FILE = "chunks.jsonl"
+OFFSETS_FILE = "chunks.idx"
+VECTORS_FILE = "vectors.f32"
+
+
+class KnowbaseWriter:
+    """Write chunks, metadata and L2-normalized vectors into a new knowledge base artifact.
+
+    Everything is written into a sibling build directory and only swapped
+    into place by commit(), so a running app never sees a half-written
+    artifact.
+    """
+
+    def __init__(self, path=KNOWBASE_DIR, model_name="", dimension=384):
+        self.path = Path(path)
+        self.build_path = self.path.with_name(self.path.name + ".building")
+        self.model_name = model_name
+        self.dimension = dimension
+        self.count = 0
+
+        if self.build_path.exists():
+            shutil.rmtree(self.build_path)
+        self.build_path.mkdir(parents=True)
+
+        self._chunks = open(self.build_path / CHUNKS_FILE, "wb")
+        self._vectors = open(self.build_path / VECTORS_FILE, "wb")
+        self._offsets = []
+
+    def add(self, texts, metadatas, vectors, ids=None):
+        """Append a batch of chunk texts with their metadata and embeddings"""
+        vectors = np.asarray(vectors, dtype=np.float32).reshape(-1, self.dimension)
+        # Stored unit-length so the local index can search with plain dot products
+        vectors = vectors / np.maximum(np.linalg.norm(vectors, axis=1, keepdims=True), 1e-12)
+        if not (len(texts) == len(metadatas) == len(vectors)):
+            raise ValueError("texts, metadatas and vectors must have the same length")
+
+        for i, (text, metadata) in enumerate(zip(texts, metadatas)):
+            chunk_id = ids[i] if ids else f"chunk-{self.count}"
+            line = json.dumps({"id": chunk_id, "text": text, "metadata": metadata}, ensure_ascii=False)
+            self._offsets.append(self._chunks.tell())
+            self._chunks.write(line.encode("utf-8") + b"\n")
+            self.count += 1
+
+        self._vectors.write(vectors.tobytes())
+
+    def commit(self, extra=None):
+        """Finish the artifact and atomically replace the previous version.
+
+        extra is merged into the manifest (store_index.py keeps its per-source
+        hashes there).
+        """
+        self._offsets.append(self._chunks.tell())
+        self._chunks.close()
+        self._vectors.close()
+        np.asarray(self._offsets, dtype=np.uint64).tofile(self.build_path / OFFSETS_FILE)
+
+        manifest = {
+            "format_version": KNOWBASE_FORMAT_VERSION,
+            "build_id": datetime.now().strftime("%Y%m%d%H%M%S%f"),
+            "model_name": self.model_name,
+            "dimension": self.dimension,
+            "count": self.count,
+            "normalized": True,
+            **(extra or {}),
+        }
+        with open(self.build_path / MANIFEST_FILE, "w", encoding="utf-8") as f:
+            json.dump(manifest, f, indent=2)
+
+        old_path = self.path.with_name(self.path.name + ".old")
+        if old_path.exists():
+            shutil.rmtree(old_path)
+        if self.path.exists():
+            os.replace(self.path, old_path)
+        os.replace(self.build_path, self.path)
+        if old_path.exists():
+            shutil.rmtree(old_path)
+
+        logger.info(f"Wrote knowledge base {manifest['build_id']} with {self.count} chunks to {self.path}")
+        return manifest
+
+    def abort(self):
+        self._chunks.close()
+        self._vectors.close()
+        shutil.rmtree(self.build_path, ignore_errors=True)
+
+
+class Knowbase:
+    """Read-only, memory-mapped view of a knowledge base artifact.
+
+    `vectors` is None when store_index.py --quantize dropped the float
+    vectors; the quantized codes are then the only searchable copy.
+    """
+
+    def __init__(self, path=KNOWBASE_DIR):
+        self.path = Path(path)
+
+        with open(self.path / MANIFEST_FILE, encoding="utf-8") as f:
+            self.manifest = json.load(f)
+
+        if self.manifest.get("format_version") != KNOWBASE_FORMAT_VERSION:
+            raise ValueError(
+                f"Unsupported knowledge base format {self.manifest.get('format_version')}, "
+                f"rebuild it with store_index.py"
+            )
+
+        self.model_name = self.manifest["model_name"]
+        self.dimension = self.manifest["dimension"]
+        self.count = self.manifest["count"]
+
+        if not self.manifest.get("float_vectors", True):
+            self.vectors = None
+        elif self.count:
+            self.vectors = np.memmap(self.path / VECTORS_FILE, dtype=np.float32, mode="r",
+                                     shape=(self.count, self.dimension))
+        else:
+            self.vectors = np.zeros((0, self.dimension), dtype=np.float32)
+
+        if self.count:
+            self._chunks_file = open(self.path / CHUNKS_FILE, "rb")
+            self._chunks = mmap.mmap(self._chunks_file.fileno(), 0, access=mmap.ACCESS_READ)
+        else:
+            self._chunks = b""
+        self._offsets = np.fromfile(self.path / OFFSETS_FILE, dtype=np.uint64)
+        # A copy cut short would otherwise only fail once a request reads past its end
+        if len(self._offsets) != self.count + 1 or int(self._offsets[-1]) != len(self._chunks):
+            raise ValueError(f"Truncated knowledge base at {self.path}, rebuild it with store_index.py")
+
+    def __len__(self):
+        return self.count
+
+    def chunk(self, i):
+        """Return the stored {"id", "text", "metadata"} record for row i"""
+        start, end = int(self._offsets[i]), int(self._offsets[i + 1])
+        return json.loads(self._chunks[start:end])
+
+    def ids(self):
+        """Stream the chunk ids in row order"""
+        for chunk in self:
+            yield chunk["id"]
+
+    def row_ids(self):
+        """Map chunk id -> row for every stored chunk"""
+        return {chunk["id"]: i for i, chunk in enumerate(self)}
+
+    def __iter__(self):
+        for i in range(self.count):
+            yield self.chunk(i)
+
+
+def drop_float_vectors(path, quantized):
+    """Delete the float vectors of a built artifact whose `quantized` codes will serve search instead"""
+    path = Path(path)
+    with open(path / MANIFEST_FILE, encoding="utf-8") as f:
+        manifest = json.load(f)
+    manifest.update(float_vectors=False, quantized=quantized)
+    # The manifest stops pointing at the vectors before they disappear
+    tmp_path = path / (MANIFEST_FILE + ".tmp")
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=2)
+    os.replace(tmp_path, path / MANIFEST_FILE)
+    (path / VECTORS_FILE).unlink(missing_ok=True)
+    return manifest
+
+
+def load_knowbase(path=KNOWBASE_DIR):
+    """Open the knowledge base artifact, or return None if it has not been built or cannot be read"""
+    try:
+        knowbase = Knowbase(path)
+        logger.info(f"Loaded knowledge base {knowbase.manifest['build_id']} ({knowbase.count} chunks)")
+        return knowbase
+    except FileNotFoundError:
+        logger.error(f"No knowledge base found at {path}, run `python store_index.py` to build it")
+        return None
+    except (OSError, ValueError, KeyError) as e:
+        # Unknown format, corrupt manifest or truncated files: serve without it rather than not start
+        logger.error(f"Knowledge base at {path} is unusable ({e!r}), run `python store_index.py` to rebuild it")
+        return None
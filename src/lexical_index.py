@@ -0,0 +1,202 @@
+#this file is src/lexical_index.py
+import json
+import logging
+import math
+import os
+import re
+from array import array
+from collections import Counter
+from pathlib import Path
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+LEXICAL_PREFIX = "lexical"
+BM25_K1 = 1.5
+BM25_B = 0.75
+# Postings held in memory while building before a run is spilled to disk (~10 bytes each)
+LEXICAL_RUN_POSTINGS = int(os.environ.get("LEXICAL_RUN_POSTINGS", 4_000_000))
+POSTING_DTYPE = np.dtype([("term", np.uint32), ("row", np.uint32), ("tf", np.uint16)])
+
+TOKEN_PATTERN = re.compile(r"[a-z0-9]+")
+STOPWORDS = frozenset("""
+a an and are as at be but by for from has have if in into is it its of on or such that the their then there
+these they this to was were will with i you your my me we our he she his her them what which who how do does
+""".split())
+
+
+def tokenize(text):
+    """Lowercased alphanumeric terms; keeps short medical terms such as "tb", "prep" or "dots" """
+    return [t for t in TOKEN_PATTERN.findall(text.lower()) if t not in STOPWORDS]
+
+
+def lexical_index_paths(knowbase_path):
+    base = Path(knowbase_path)
+    return {
+        "params": base / f"{LEXICAL_PREFIX}.json",
+        "vocab": base / f"{LEXICAL_PREFIX}.vocab.json",
+        "docs": base / f"{LEXICAL_PREFIX}.docs.u32",
+        "tfs": base / f"{LEXICAL_PREFIX}.tfs.u16",
+        "lengths": base / f"{LEXICAL_PREFIX}.lengths.u32",
+    }
+
+
+def _write_run(run_path, terms, rows, tfs):
+    """Spill postings to disk sorted by term id; the stable sort keeps rows ascending within a term"""
+    run = np.empty(len(terms), dtype=POSTING_DTYPE)
+    run["term"], run["row"], run["tf"] = terms, rows, tfs
+    run[np.argsort(run["term"], kind="stable")].tofile(run_path)
+
+
+def build_lexical_index(knowbase, run_postings=LEXICAL_RUN_POSTINGS):
+    """Build the BM25 inverted index over the knowledge base chunks.
+
+    Postings are stored term by term as two flat arrays (chunk rows as uint32,
+    term frequencies as uint16); the vocabulary maps each term to its
+    [offset, document frequency] slice. Like the chunk and vector writers,
+    memory stays bounded whatever the corpus size: postings are spilled to
+    disk as term-sorted runs of run_postings, and once every document
+    frequency is known the runs are merged, in row order, by placing each one
+    straight into its terms' slices of the memory-mapped output arrays.
+    """
+    paths = lexical_index_paths(knowbase.path)
+    term_ids = {}
+    df = array("Q")
+    lengths = np.zeros(len(knowbase), dtype=np.uint32)
+    runs = []
+    terms, rows, tfs = array("I"), array("I"), array("H")
+
+    def spill():
+        run_path = paths["docs"].with_name(f"{LEXICAL_PREFIX}.run{len(runs)}")
+        _write_run(run_path, terms, rows, tfs)
+        runs.append(run_path)
+        del terms[:], rows[:], tfs[:]
+
+    try:
+        for row, chunk in enumerate(knowbase):
+            tokens = tokenize(chunk["text"])
+            lengths[row] = len(tokens)
+            for term, tf in Counter(tokens).items():
+                term_id = term_ids.get(term)
+                if term_id is None:
+                    term_id = term_ids[term] = len(term_ids)
+                    df.append(0)
+                df[term_id] += 1
+                terms.append(term_id)
+                rows.append(row)
+                tfs.append(min(tf, 65535))
+            if len(terms) >= run_postings:
+                spill()
+        if len(terms):
+            spill()
+
+        # Slices in sorted term order, addressed by term id
+        counts = np.asarray(df, dtype=np.int64)
+        ordered = sorted(term_ids)
+        order = np.asarray([term_ids[term] for term in ordered], dtype=np.int64)
+        offsets = np.zeros(len(counts), dtype=np.int64)
+        offsets[order] = np.cumsum(counts[order]) - counts[order]
+        total = int(counts.sum())
+
+        docs = np.memmap(paths["docs"], dtype=np.uint32, mode="w+", shape=(total,)) if total else None
+        tf_out = np.memmap(paths["tfs"], dtype=np.uint16, mode="w+", shape=(total,)) if total else None
+        cursor = np.zeros(len(counts), dtype=np.int64)
+        for run_path in runs:
+            run = np.fromfile(run_path, dtype=POSTING_DTYPE)
+            run_terms = run["term"].astype(np.int64)
+            in_run = np.bincount(run_terms, minlength=len(counts))
+            first = np.cumsum(in_run) - in_run
+            dest = offsets[run_terms] + cursor[run_terms] + (np.arange(len(run)) - first[run_terms])
+            docs[dest] = run["row"]
+            tf_out[dest] = run["tf"]
+            cursor += in_run
+            del run, run_terms, dest
+        if total:
+            docs.flush()
+            tf_out.flush()
+            del docs, tf_out
+        else:
+            open(paths["docs"], "wb").close()
+            open(paths["tfs"], "wb").close()
+    finally:
+        for run_path in runs:
+            run_path.unlink(missing_ok=True)
+    lengths.tofile(paths["lengths"])
+
+    vocab = {term: [int(offsets[term_ids[term]]), int(counts[term_ids[term]])] for term in ordered}
+    with open(paths["vocab"], "w", encoding="utf-8") as f:
+        json.dump(vocab, f, separators=(",", ":"))
+    with open(paths["params"], "w", encoding="utf-8") as f:
+        json.dump({
+            "build_id": knowbase.manifest["build_id"],
+            "documents": len(knowbase),
+            "average_length": float(lengths.mean()) if len(lengths) else 0.0,
+        }, f, indent=2)
+
+    logger.info(f"Built lexical index with {len(vocab)} terms over {len(knowbase)} chunks in {len(runs)} runs")
+
+
+class BM25Index:
+    """BM25 search over the prebuilt, memory-mapped inverted index"""
+
+    def __init__(self, vocab, docs, tfs, lengths, average_length, k1=BM25_K1, b=BM25_B):
+        self.vocab = vocab
+        self.docs = docs
+        self.tfs = tfs
+        self.lengths = lengths
+        self.count = len(lengths)
+        self.k1 = k1
+        # Per-document length normalisation, computed once
+        self._norm = (k1 * (1 - b + b * lengths / max(average_length, 1e-9))).astype(np.float32)
+
+    @classmethod
+    def load(cls, knowbase):
+        paths = lexical_index_paths(knowbase.path)
+        with open(paths["params"], encoding="utf-8") as f:
+            params = json.load(f)
+        if params["build_id"] != knowbase.manifest["build_id"]:
+            raise ValueError(f"lexical index was built for knowledge base {params['build_id']}")
+        with open(paths["vocab"], encoding="utf-8") as f:
+            vocab = json.load(f)
+
+        def mapped(path, dtype):
+            return np.memmap(path, dtype=dtype, mode="r") if path.stat().st_size else np.zeros(0, dtype=dtype)
+
+        return cls(vocab, mapped(paths["docs"], np.uint32), mapped(paths["tfs"], np.uint16),
+                   np.fromfile(paths["lengths"], dtype=np.uint32), params["average_length"])
+
+    def __len__(self):
+        return self.count
+
+    def search(self, query, k=3):
+        """Return (rows, BM25 scores) of the k best matching chunks"""
+        scores = np.zeros(self.count, dtype=np.float32)
+        for term in set(tokenize(query)):
+            entry = self.vocab.get(term)
+            if entry is None:
+                continue
+            offset, df = entry
+            rows = self.docs[offset:offset + df]
+            tf = self.tfs[offset:offset + df].astype(np.float32)
+            idf = math.log(1 + (self.count - df + 0.5) / (df + 0.5))
+            scores[rows] += idf * tf * (self.k1 + 1) / (tf + self._norm[rows])
+
+        matched = np.flatnonzero(scores)
+        if len(matched) == 0:
+            return matched, scores[matched]
+        k = min(k, len(matched))
+        best = matched[np.argpartition(-scores[matched], k - 1)[:k]]
+        best = best[np.argsort(-scores[best], kind="stable")]
+        return best, scores[best]
+
+
+def load_lexical_index(knowbase):
+    """Open the BM25 index for a knowledge base, or None if it was not built"""
+    try:
+        index = BM25Index.load(knowbase)
+        logger.info(f"Loaded lexical index with {len(index.vocab)} terms")
+        return index
+    except (FileNotFoundError, ValueError) as e:
+        logger.warning(f"Lexical index unavailable ({e}), rebuild it with `python store_index.py`")
+        return None
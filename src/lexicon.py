@@ -0,0 +1,142 @@
+#this file is src/lexicon.py
+# Keyword lexicons used to read symptoms, places and exposures out of a
+# patient message. They are compiled once into a single KeywordMatcher so a
+# message is scanned in one pass instead of once per keyword. Keywords match
+# whole words; a trailing "*" marks a stem that also matches its inflections.
+from src.matcher import KeywordMatcher
+
+SYMPTOM_KEYWORDS = {
+    'fever': ['fever*', 'temperature', 'hot', 'burning up'],
+    'headache': ['headache*', 'head hurts', 'head pain', 'head aching'],
+    'muscle pain': ['muscle*', 'body ache', 'muscles aching', 'body pain'],
+    'fatigue': ['tired', 'weak', 'exhausted', 'fatigue', 'no energy'],
+    'rash': ['rash*', 'spots', 'skin marks', 'bumps'],
+    'cough': ['cough*', 'coughing'],
+    'sore throat': ['throat', 'swallow hurts'],
+    'diarrhea': ['diarrhea', 'loose stool', 'stomach runs'],
+    'nausea': ['nausea', 'feel sick', 'vomit*', 'throw up'],
+    'abdominal pain': ['stomach pain', 'belly ache', 'abdominal pain'],
+    'chills': ['chills', 'shivering', 'cold'],
+    'sweating': ['sweat*', 'sweating', 'night sweats'],
+    'shortness of breath': ['shortness of breath', 'breathless', 'difficulty breathing'],
+    'chest pain': ['chest pain', 'chest hurts', 'pain in chest'],
+    'dizziness': ['dizzy', 'lightheaded', 'faint*'],
+    'bleeding': ['bleeding', 'blood', 'bleed*'],
+    'itching': ['itchy', 'itching', 'scratchy'],
+    'swelling': ['swelling', 'swollen', 'puffy'],
+    'weight loss': ['weight loss', 'losing weight', 'lost weight', 'unexplained weight loss', 'losing weight without trying'],
+    'night sweats': ['night sweats', 'sweat at night'],
+    'confusion': ['confused', 'confusion', 'disoriented'],
+    'seizures': ['seizures', 'convulsions', 'fits'],
+    'loss of consciousness': ['unconscious', 'passed out', 'blackout'],
+    'joint pain': ['joint pain', 'joints hurting', 'joint aches'],
+    'stiffness': ['stiff', 'stiffness', 'hard to move'],
+    'numbness': ['numb', 'numbness', 'no feeling'],
+    'vision changes': ['vision changes', 'blurred vision', 'double vision'],
+    'hearing loss': ['hearing loss', 'deaf', 'hard of hearing'],
+    'ear pain': ['ear pain', 'earache', 'ear hurts'],
+    'toothache': ['toothache', 'tooth pain', 'tooth hurts'],
+    'back pain': ['back pain', 'back hurts', 'backache'],
+    'leg pain': ['leg pain', 'leg hurts', 'legache'],
+    'swollen lymph nodes': ['swollen lymph nodes', 'swollen glands', 'lumps in neck', 'lumps in armpit'],
+    'loss of appetite': ['loss of appetite', 'not hungry', 'no appetite'],
+    'coughing blood': ['coughing blood', 'blood in cough', 'coughing up blood'],
+    'persistent cough': ['persistent cough', 'long cough', 'cough lasting'],
+    'night sweats': ['night sweats', 'sweating at night'],
+    'unexplained weight loss': ['unexplained weight loss', 'losing weight without trying'],
+    'body aches': ['body aches', 'body pain', 'aches all over'],
+    'chest tightness': ['chest tightness', 'tight chest', 'chest feels tight'],
+    'wheezing': ['wheezing', 'whistling sound when breathing', 'wheeze'],
+    'loss of smell': ['loss of smell', 'cant smell', 'no sense of smell'],
+    'loss of taste': ['loss of taste', 'cant taste', 'no sense of taste'],
+    'runny nose': ['runny nose', 'nose is runny', 'nasal discharge'],
+    'sneezing': ['sneezing', 'sneeze', 'sneezes'],
+    'fever with chills': ['hot and cold', 'shivering fever', 'fever with shaking'],
+    'jaundice': ['yellow eyes', 'yellow skin', 'jaundice'],
+    'bloody diarrhea': ['bloody diarrhea', 'blood in stool', 'bloody stool'],
+    'persistent vomiting': ['persistent vomiting', 'vomiting a lot', 'throwing up a lot'],
+}
+
+LOCATIONS = ["durban", "johannesburg", "cape town", "pretoria", "limpopo",
+             "mpumalanga", "kwazulu-natal", "mozambique", "zimbabwe", "botswana",
+             "malawi", "tanzania", "kenya", "uganda", "angola", "namibia",
+             "zambia", "congo", "ethiopia", "sudan", "south sudan"]
+
+ACTIVITY_PATTERNS = {
+    'sexual': ['unprotected sex', 'had sex', 'sexual', 'intercourse', 'sexually active', ],
+    'travel': ['travel*', 'trip', 'vacation', 'went to', 'visited', 'travelled', 'traveling', 'traveled', 'travelling'],
+    'food': ['ate', 'eating', 'food', 'meal', 'drank', 'water', 'restaurant', 'dining'],
+    'mosquito': ['mosquito*', 'bitten', 'bugs', 'insects', 'bug bites', 'mosquitoes'],
+    'contact': ['contact with', 'exposed to', 'around someone with', 'someone who has', 'cared for someone with'],
+    'animal': ['animal*', 'pet', 'dog*', 'cat', 'cattle', 'livestock', 'wildlife'],
+    'hospital': ['hospital', 'clinic', 'healthcare', 'medical facility', 'doctor', 'nurse'],
+    'crowded': ['crowded', 'large gathering', 'party', 'event', 'crowd', 'public transport'],
+    'water': ['swam', 'swimming', 'water', 'lake', 'river', 'pool', 'beach'],
+    'hiking': ['hiking', 'camping', 'outdoors', 'trekking', 'nature', 'bush'],
+    'farming': ['farming', 'farm*', 'agriculture', 'crops', 'field work'],
+    'construction': ['construction', 'building site', 'worksite', 'dusty', 'debris'],
+    'mining': ['mining', 'mine', 'underground', 'miner', 'shaft'],
+    'healthcare': ['healthcare worker', 'nurse', 'doctor', 'hospital staff', 'clinic worker'],
+    'prison': ['prison', 'jail', 'inmate', 'correctional facility', 'detention center'],
+    'school': ['school', 'classroom', 'student', 'teacher', 'university', 'college'],
+    'military': ['military', 'soldier', 'army', 'navy', 'air force', 'base'],
+    'refugee': ['refugee', 'displaced', 'camp', 'asylum seeker', 'migrant'],
+    'homeless': ['homeless', 'shelter', 'street', 'living rough', 'no fixed address'],
+    'elderly': ['elderly', 'senior', 'old age', 'retirement home', 'nursing home'],
+    'childcare': ['childcare', 'daycare', 'nursery', 'preschool', 'kindergarten'],
+}
+
+URGENT_SYMPTOMS = ['chest pain', 'difficulty breathing', 'severe bleeding', 'unconscious']
+
+LEXICONS = {
+    'symptom': SYMPTOM_KEYWORDS,
+    'location': {loc: [loc] for loc in LOCATIONS},
+    'activity': ACTIVITY_PATTERNS,
+    'urgent': {sign: [sign] for sign in URGENT_SYMPTOMS},
+}
+
+# Terms picked out of a whole conversation for the doctor's summary. They are
+# plain substring matches (no word boundary), as the summary has always used.
+SUMMARY_SYMPTOMS = ['fever', 'headache', 'cough', 'pain', 'fatigue', 'nausea',
+                    'vomiting', 'diarrhea', 'rash', 'weakness', 'dizziness', 'chills',
+                    'sweating', 'sore throat', 'runny nose', 'body ache', 'muscle pain',
+                    'abdominal pain', 'shortness of breath', 'chest pain', 'bleeding',
+                    'swelling', 'itching', 'redness', 'loss of appetite', 'weight loss',
+                    'night sweats', 'confusion', 'seizures', 'loss of consciousness',
+                    'joint pain', 'stiffness', 'numbness', 'tingling', 'vision changes',
+                    'hearing loss', 'ear pain', 'toothache', 'back pain', 'leg pain']
+
+MEDICATIONS = ['paracetamol', 'ibuprofen', 'antibiotic', 'aspirin', 'insulin']
+
+DIAGNOSTIC_TERMS = ['test', 'x-ray', 'blood test', 'scan', 'examination',
+                    'diagnosis', 'diagnose', 'lab results']
+
+SUMMARY_LEXICONS = {
+    'summary_symptom': {term: [term] for term in SUMMARY_SYMPTOMS},
+    'medication': {term: [term] for term in MEDICATIONS},
+    'diagnostic': {term: [term] for term in DIAGNOSTIC_TERMS},
+    'urgent_mention': {'urgent': ['urgent', 'emergency']},
+    'follow_up': {'follow up': ['follow up', 'follow-up']},
+}
+
+
+def compile_lexicons(lexicons=LEXICONS, substring_lexicons=SUMMARY_LEXICONS):
+    """Build one matcher over every lexicon; values are (category, label, ordinal)"""
+    matcher = KeywordMatcher(word_boundary=True)
+    for word_boundary, group in ((True, lexicons), (False, substring_lexicons)):
+        for category, entries in group.items():
+            for ordinal, (label, keywords) in enumerate(entries.items()):
+                for keyword in keywords:
+                    matcher.add(keyword, (category, label, ordinal), word_boundary=word_boundary)
+    return matcher.build()
+
+
+LEXICON_MATCHER = compile_lexicons()
+
+
+def match_lexicons(text, matcher=LEXICON_MATCHER):
+    """Every lexicon hit in lowercased text, as {category: [labels in lexicon order]}"""
+    hits = {category: set() for category in (*LEXICONS, *SUMMARY_LEXICONS)}
+    for _, _, (category, label, ordinal) in matcher.find(text):
+        hits.setdefault(category, set()).add((ordinal, label))
+    return {category: [label for _, label in sorted(found)] for category, found in hits.items()}
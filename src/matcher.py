@@ -0,0 +1,98 @@
+#this file is src/matcher.py
+from collections import deque
+
+
+def _is_word_char(char):
+    return char.isalnum()
+
+
+class KeywordMatcher:
+    """Aho-Corasick automaton over many keywords, matched in one pass.
+
+    Each keyword is added with a value (e.g. ("symptom", "fever")); find()
+    walks the text once and reports every keyword occurrence regardless of
+    how many keywords were compiled. With word_boundary=True a hit must be
+    whole words, so "hot" fires on neither "shot" nor "hotel" and "cat" not on
+    "category". A keyword ending in "*" is a stem: only its start is anchored,
+    so it also matches inflections ("vomit*" -> "vomiting", "muscle*" ->
+    "muscles") and its hit spans the whole inflected word. With word_boundary=False it behaves exactly like
+    `keyword in text`.
+    """
+
+    def __init__(self, word_boundary=True):
+        self.word_boundary = word_boundary
+        self._goto = [{}]
+        self._fail = [0]
+        self._own = [[]]
+        self._outputs = [[]]
+        self._built = True
+
+    def add(self, keyword, value, word_boundary=None):
+        """Add a keyword; word_boundary overrides the matcher default for this keyword"""
+        if word_boundary is None:
+            word_boundary = self.word_boundary
+        stem = keyword.endswith("*")
+        if stem:
+            keyword = keyword[:-1]
+        state = 0
+        for char in keyword:
+            next_state = self._goto[state].get(char)
+            if next_state is None:
+                next_state = len(self._goto)
+                self._goto[state][char] = next_state
+                self._goto.append({})
+                self._fail.append(0)
+                self._own.append([])
+                self._outputs.append([])
+            state = next_state
+        self._own[state].append((len(keyword), value, word_boundary, stem))
+        self._built = False
+        return self
+
+    def build(self):
+        """Compute failure links; called automatically before the first search"""
+        queue = deque(self._goto[0].values())
+        for state in queue:
+            self._fail[state] = 0
+            self._outputs[state] = list(self._own[state])
+        while queue:
+            state = queue.popleft()
+            for char, next_state in self._goto[state].items():
+                queue.append(next_state)
+                fail = self._fail[state]
+                while fail and char not in self._goto[fail]:
+                    fail = self._fail[fail]
+                self._fail[next_state] = self._goto[fail].get(char, 0)
+                # Shorter keywords ending here are reached through the failure link
+                self._outputs[next_state] = self._own[next_state] + self._outputs[self._fail[next_state]]
+        self._built = True
+        return self
+
+    def find(self, text):
+        """Yield (start, end, value) for every keyword occurrence in text"""
+        if not self._built:
+            self.build()
+        goto, fail, outputs = self._goto, self._fail, self._outputs
+        state = 0
+        for i, char in enumerate(text):
+            while state and char not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(char, 0)
+            for length, value, word_boundary, stem in outputs[state]:
+                start, end = i - length + 1, i + 1
+                if word_boundary:
+                    if start > 0 and _is_word_char(text[start - 1]):
+                        continue
+                    if end < len(text) and _is_word_char(text[end]):
+                        if not stem:
+                            continue
+                        while end < len(text) and _is_word_char(text[end]):
+                            end += 1
+                yield start, end, value
+
+    def matches(self, text):
+        """Set of values whose keyword occurs in text"""
+        return {value for _, _, value in self.find(text)}
+
+    def __len__(self):
+        return len(self._goto)
@@ -0,0 +1,71 @@
+#this file is src/message.py
+import re
+
+from src.lexicon import match_lexicons
+
+TOKEN_PATTERN = re.compile(r"[a-z0-9]+(?:[-'][a-z0-9]+)*")
+MAX_NGRAM = 3
+
+
+class ParsedMessage:
+    """A chat message normalized and scanned once.
+
+    Holds the lowercased text, its spelling-corrected form, tokens and
+    1..MAX_NGRAM-grams, and every lexicon hit (symptoms, places, activities,
+    urgent signs and the summary terms) from a single matcher pass over the
+    corrected text. analyze_symptoms and find_matching_disease (which matches
+    the uncorrected text) read from it, and its hits are what conversation
+    memory keeps (as a ScannedText), so old messages are never re-scanned.
+    """
+
+    __slots__ = ("text", "lower", "corrected", "corrections", "tokens", "ngrams", "hits")
+
+    def __init__(self, text, speller=None):
+        self.text = text or ""
+        self.lower = self.text.lower()
+        # Typos in symptom words ("feaver", "diarhea", "head ake") are fixed before
+        # lexicon matching so they do not fall through to the RAG/LLM fallback
+        self.corrected, self.corrections = speller.correct(self.lower) if speller else (self.lower, [])
+        self.tokens = TOKEN_PATTERN.findall(self.corrected)
+        self.ngrams = {" ".join(self.tokens[i:i + n])
+                       for n in range(1, MAX_NGRAM + 1)
+                       for i in range(len(self.tokens) - n + 1)}
+        self.hits = match_lexicons(self.corrected)
+
+    def __str__(self):
+        return self.text
+
+    def __repr__(self):
+        return f"ParsedMessage({self.text[:40]!r})"
+
+
+class ScannedText:
+    """Just a text and its lexicon hits: what conversation memory keeps for the summary.
+
+    Bot answers are scanned as written, with no spelling correction, tokens or
+    n-grams; a ParsedMessage hands over the hits it already has.
+    """
+
+    __slots__ = ("text", "hits")
+
+    def __init__(self, text, hits=None):
+        self.text = text or ""
+        self.hits = match_lexicons(self.text.lower()) if hits is None else hits
+
+    @classmethod
+    def of(cls, message):
+        if isinstance(message, cls):
+            return message
+        if isinstance(message, ParsedMessage):
+            return cls(message.text, message.hits)
+        return cls(message)
+
+    def __str__(self):
+        return self.text
+
+
+def parse_message(message, snapshot):
+    """ParsedMessage for a str, spelling-corrected with the snapshot's speller; an already parsed message is returned as is"""
+    if isinstance(message, ParsedMessage):
+        return message
+    return ParsedMessage(message, snapshot.speller)
@@ -0,0 +1,132 @@
+#this file is src/query_embedder.py
+import logging
+import os
+import re
+import threading
+from collections import OrderedDict
+from concurrent.futures import Future
+
+from langchain_core.embeddings import Embeddings
+
+from src.deadline import stage_budget_ms
+
+logger = logging.getLogger(__name__)
+
+QUERY_CACHE_SIZE = int(os.environ.get("QUERY_CACHE_SIZE", 4096))
+# How long the batcher waits for more concurrent queries before embedding
+BATCH_WAIT_MS = float(os.environ.get("QUERY_BATCH_WAIT_MS", 5))
+MAX_BATCH_SIZE = int(os.environ.get("QUERY_MAX_BATCH", 32))
+# Longest a caller waits for its vector; inside a request it is cut to the retrieval budget
+QUERY_EMBED_TIMEOUT_MS = float(os.environ.get("QUERY_EMBED_TIMEOUT_MS", 10000))
+
+
+def normalize_query(text):
+    """Cache key for a query: case and whitespace differences do not change the answer"""
+    return re.sub(r"\s+", " ", text).strip().lower()
+
+
+class QueryEmbedder(Embeddings):
+    """Query embeddings with an LRU cache and cross-request micro-batching.
+
+    Identical questions (after normalize_query) are served from an in-memory
+    LRU. Misses are queued; a single background thread waits up to
+    batch_wait_ms for other requests' queries and embeds the whole batch in
+    one forward pass, then hands each caller its vector. The thread is started
+    on first use, and again in a forked child, which does not inherit it;
+    a caller waits for its vector no longer than the retrieval budget
+    allows. Document embedding
+    is delegated unchanged, so this can be passed anywhere an Embeddings is
+    expected (PineconeVectorStore, LocalVectorStore, the answer cache).
+    """
+
+    def __init__(self, embeddings, cache_size=QUERY_CACHE_SIZE, batch_wait_ms=BATCH_WAIT_MS,
+                 max_batch_size=MAX_BATCH_SIZE):
+        self.embeddings = embeddings
+        self.model_name = getattr(embeddings, "model_name", type(embeddings).__name__)
+        self.cache_size = cache_size
+        self.batch_wait = batch_wait_ms / 1000
+        self.max_batch_size = max_batch_size
+
+        self._cache = OrderedDict()
+        self._start_lock = threading.Lock()
+        self._pid = None
+
+    def _ensure_worker(self):
+        if self._pid == os.getpid():
+            return
+        with self._start_lock:
+            if self._pid == os.getpid():
+                return
+            # Locks and queued futures copied over a fork belong to the parent's threads
+            self._cache_lock = threading.Lock()
+            self._queue = []
+            self._queue_ready = threading.Condition()
+            self._inflight = {}
+            threading.Thread(target=self._run, name="query-embedder", daemon=True).start()
+            self._pid = os.getpid()
+
+    def _cached(self, key):
+        with self._cache_lock:
+            vector = self._cache.get(key)
+            if vector is not None:
+                self._cache.move_to_end(key)
+            return vector
+
+    def _remember(self, key, vector):
+        with self._cache_lock:
+            self._cache[key] = vector
+            self._cache.move_to_end(key)
+            while len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+
+    def embed_query(self, text):
+        self._ensure_worker()
+        key = normalize_query(text)
+        vector = self._cached(key)
+        if vector is not None:
+            return vector
+
+        with self._queue_ready:
+            # Concurrent requests for the same question share one embedding
+            future = self._inflight.get(key)
+            if future is None:
+                future = Future()
+                self._inflight[key] = future
+                self._queue.append((key, future))
+                self._queue_ready.notify()
+        # A late vector is still cached for the next asker once the batch finishes
+        return future.result(timeout=stage_budget_ms("retrieval", QUERY_EMBED_TIMEOUT_MS) / 1000)
+
+    def _run(self):
+        while True:
+            with self._queue_ready:
+                while not self._queue:
+                    self._queue_ready.wait()
+                # Give concurrent requests a moment to join this batch
+                self._queue_ready.wait_for(lambda: len(self._queue) >= self.max_batch_size, timeout=self.batch_wait)
+                batch = self._queue[:self.max_batch_size]
+                del self._queue[:self.max_batch_size]
+
+            keys = [key for key, _ in batch]
+            try:
+                vectors = self.embeddings.embed_documents(keys)
+            except Exception as e:
+                logger.error(f"Query embedding failed: {e}")
+                for key, future in batch:
+                    self._finish(key, future, error=e)
+                continue
+
+            for (key, future), vector in zip(batch, vectors):
+                self._remember(key, vector)
+                self._finish(key, future, vector)
+
+    def _finish(self, key, future, vector=None, error=None):
+        with self._queue_ready:
+            self._inflight.pop(key, None)
+        if error is not None:
+            future.set_exception(error)
+        else:
+            future.set_result(vector)
+
+    def embed_documents(self, texts):
+        return self.embeddings.embed_documents(texts)
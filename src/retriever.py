@@ -0,0 +1,100 @@
+#this file is src/retriever.py
+import logging
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeout
+from typing import Any, List
+
+from langchain_core.documents import Document
+from langchain_core.retrievers import BaseRetriever
+
+from src.deadline import stage_budget_ms
+
+logger = logging.getLogger(__name__)
+
+# Weight of the vector score in the fused score; the rest goes to BM25
+HYBRID_ALPHA = float(os.environ.get("HYBRID_ALPHA", 0.5))
+# Vector search slower than this falls back to the lexical results alone
+VECTOR_TIMEOUT_MS = int(os.environ.get("VECTOR_TIMEOUT_MS", 800))
+# After a vector failure or timeout, serve lexical-only for this long
+VECTOR_COOLDOWN_S = float(os.environ.get("VECTOR_COOLDOWN_S", 30))
+
+_vector_pool = ThreadPoolExecutor(max_workers=8, thread_name_prefix="vector-search")
+
+
+def _doc_key(doc):
+    return doc.metadata.get("id") or doc.page_content
+
+
+class HybridRetriever(BaseRetriever):
+    """Fuse BM25 and vector similarity over the knowledge base chunks.
+
+    Both sides fetch k * fetch_factor candidates; each score list is scaled to
+    [0, 1] by its best hit and combined as alpha * vector + (1 - alpha) * bm25.
+    Exact terms such as drug names, "PrEP" or "DOTS" that MiniLM blurs are
+    carried by the lexical side. If the vector store (Pinecone or local) errors
+    or exceeds vector_timeout_ms, the lexical results are returned on their
+    own, and the vector side is skipped for cooldown_s before being retried.
+    """
+
+    vectorstore: Any
+    lexical: Any
+    knowbase: Any
+    k: int = 3
+    fetch_factor: int = 4
+    alpha: float = HYBRID_ALPHA
+    vector_timeout_ms: int = VECTOR_TIMEOUT_MS
+    cooldown_s: float = VECTOR_COOLDOWN_S
+    vector_down_until: float = 0.0
+
+    def _lexical_hits(self, query, n):
+        rows, scores = self.lexical.search(query, n)
+        hits = {}
+        for row, score in zip(rows, scores):
+            chunk = self.knowbase.chunk(int(row))
+            doc = Document(page_content=chunk["text"], metadata={**chunk["metadata"], "id": chunk["id"]})
+            hits[_doc_key(doc)] = (doc, float(score))
+        return hits
+
+    def _vector_hits(self, query, n):
+        if self.vectorstore is None or time.monotonic() < self.vector_down_until:
+            return None
+        # The request deadline can leave less than the configured timeout
+        timeout_ms = stage_budget_ms("retrieval", self.vector_timeout_ms)
+        if timeout_ms <= 0:
+            return None
+        future = _vector_pool.submit(self.vectorstore.similarity_search_with_score, query, n)
+        try:
+            results = future.result(timeout=timeout_ms / 1000)
+        except FutureTimeout:
+            logger.warning(f"Vector search exceeded {timeout_ms:.0f}ms, serving lexical results")
+            # Only a miss of the backend's own timeout means it is unhealthy
+            if timeout_ms >= self.vector_timeout_ms:
+                self.vector_down_until = time.monotonic() + self.cooldown_s
+            return None
+        except Exception as e:
+            logger.warning(f"Vector search failed ({e}), serving lexical results")
+            self.vector_down_until = time.monotonic() + self.cooldown_s
+            return None
+        return {_doc_key(doc): (doc, float(score)) for doc, score in results}
+
+    def _get_relevant_documents(self, query: str, *, run_manager=None) -> List[Document]:
+        n = self.k * self.fetch_factor
+        lexical = self._lexical_hits(query, n)
+        vector = self._vector_hits(query, n)
+
+        if vector is None:
+            return [doc for doc, _ in list(lexical.values())[:self.k]]
+
+        top_lexical = max((score for _, score in lexical.values()), default=0.0) or 1.0
+        top_vector = max((score for _, score in vector.values()), default=0.0) or 1.0
+
+        fused = {}
+        for key in lexical.keys() | vector.keys():
+            doc = (vector.get(key) or lexical.get(key))[0]
+            vector_score = vector[key][1] / top_vector if key in vector else 0.0
+            lexical_score = lexical[key][1] / top_lexical if key in lexical else 0.0
+            fused[key] = (doc, self.alpha * vector_score + (1 - self.alpha) * lexical_score)
+
+        ranked = sorted(fused.values(), key=lambda item: item[1], reverse=True)
+        return [doc for doc, _ in ranked[:self.k]]
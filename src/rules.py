@@ -0,0 +1,78 @@
+#this file is src/rules.py
+RULES_FILE = "Data/Medbook-home3/reasoning_rules.json"
+
+
+class ReasoningRules:
+    """Symptom-pattern rules compiled to bitsets.
+
+    Each rule names the symptoms (and optionally activities) that must all be
+    present and the condition terms it boosts. Requirements become an int
+    bitmask over a feature vocabulary, so checking a rule against a message is
+    one AND; the rules a condition name can receive are also a bitmask,
+    computed once per disease name. Matching rules are applied in file order,
+    so overlapping rules compound exactly as the old nested loops did.
+    """
+
+    def __init__(self, rules):
+        self.rules = [rule for rule in rules if rule.get('enabled', True)]
+        self.features = {}
+        self._required = [self._mask(self._rule_features(rule)) for rule in self.rules]
+        self._by_condition = {}
+
+    @staticmethod
+    def _rule_features(rule):
+        return ([('symptom', s) for s in rule.get('symptoms', [])]
+                + [('activity', a) for a in rule.get('activities', [])])
+
+    def _mask(self, features, grow=True):
+        mask = 0
+        for feature in features:
+            bit = self.features.get(feature)
+            if bit is None:
+                if not grow:
+                    continue
+                bit = self.features[feature] = len(self.features)
+            mask |= 1 << bit
+        return mask
+
+    def matching(self, context):
+        """Bitmask of the rules whose requirements are all present in context"""
+        present = self._mask([('symptom', s) for s in context.get('symptoms', [])]
+                             + [('activity', a) for a in context.get('activities', [])], grow=False)
+        matched = 0
+        for i, required in enumerate(self._required):
+            if required & present == required:
+                matched |= 1 << i
+        return matched
+
+    def for_condition(self, disease):
+        """Bitmask of the rules with a condition term occurring in this disease name"""
+        mask = self._by_condition.get(disease)
+        if mask is None:
+            name = disease.lower()
+            mask = 0
+            for i, rule in enumerate(self.rules):
+                if any(term in name for term in rule.get('conditions', [])):
+                    mask |= 1 << i
+            self._by_condition[disease] = mask
+        return mask
+
+    def apply(self, analysis):
+        """Boost the analysis' conditions that match a firing rule"""
+        matched = self.matching(analysis['context'])
+        if not matched:
+            return analysis
+        for cond in analysis['possible_conditions']:
+            applicable = matched & self.for_condition(cond['disease'])
+            while applicable:
+                i = (applicable & -applicable).bit_length() - 1
+                applicable &= applicable - 1
+                rule = self.rules[i]
+                cond['confidence'] = min(cond['confidence'] * rule.get('boost', 1.3), rule.get('cap', 0.95))
+                cond['pattern_match'] = True
+                cond['symptom_pattern'] = ', '.join(rule.get('symptoms', []))
+        return analysis
+
+    def __len__(self):
+        return len(self.rules)
+
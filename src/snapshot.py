@@ -0,0 +1,145 @@
+#this file is src/snapshot.py
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+from pathlib import Path
+
+from src.body_regions import BodyRegionTable, BODY_REGIONS_FILE
+from src.disease_index import DiseaseIndex
+from src.fuzzy import build_symptom_speller
+from src.catalogue import disease_catalogue, MEDICAL_DISEASE_FILE
+from src.knowbase import KNOWBASE_DIR
+from src.rules import ReasoningRules, RULES_FILE
+
+logger = logging.getLogger(__name__)
+
+# How often the watcher checks the data files for changes; 0 disables reloading
+KNOWLEDGE_RELOAD_INTERVAL_S = float(os.environ.get("KNOWLEDGE_RELOAD_INTERVAL_S", 5))
+
+
+class KnowledgeSnapshot:
+    """One immutable version of the disease knowledge and everything derived from it.
+
+    Holds the catalogue, its DiseaseIndex (scoring matrix and name matcher),
+    the compiled reasoning rules, the symptom speller and the body map's
+    region table. A request handler reads `knowledge.current` once and passes
+    that snapshot to every stage (parse_message, analyze_symptoms,
+    find_matching_disease), so a reload in the middle of a request can never
+    mix old and new data.
+    """
+
+    def __init__(self, version, diseases, rules, speller, body_regions, sources):
+        self.version = version
+        self.built_at = time.time()
+        self.diseases = diseases
+        self.disease_index = DiseaseIndex(diseases)
+        self.rules = rules
+        self.speller = speller
+        self.body_regions = body_regions
+        self.sources = sources
+
+    def __len__(self):
+        return len(self.diseases)
+
+
+def _file_state(paths):
+    states = []
+    for path in paths:
+        try:
+            stat = os.stat(path)
+            states.append((stat.st_mtime_ns, stat.st_size))
+        except FileNotFoundError:
+            states.append(None)
+    return tuple(states)
+
+
+def _read_optional(path, default):
+    try:
+        return path.read_bytes()
+    except FileNotFoundError:
+        return default
+
+
+def build_snapshot(disease_file=MEDICAL_DISEASE_FILE, rules_file=RULES_FILE, regions_file=BODY_REGIONS_FILE,
+                   knowbase_path=KNOWBASE_DIR):
+    """Read the data files and build every index; raises on unreadable or invalid data"""
+    base = Path(__file__).parent.parent
+    disease_bytes = (base / disease_file).read_bytes()
+    rules_bytes = _read_optional(base / rules_file, b'{"rules": []}')
+    regions_bytes = _read_optional(base / regions_file, b'{}')
+
+    version = hashlib.sha256(b"\0".join([disease_bytes, rules_bytes, regions_bytes])).hexdigest()[:12]
+    diseases = disease_catalogue(json.loads(disease_bytes))
+    rules = ReasoningRules(json.loads(rules_bytes).get('rules', []))
+    speller = build_symptom_speller(diseases, knowbase_path)
+    body_regions = BodyRegionTable(json.loads(regions_bytes))
+    return KnowledgeSnapshot(version, diseases, rules, speller, body_regions,
+                             sources=(disease_file, rules_file, regions_file))
+
+
+class KnowledgeBase:
+    """The current KnowledgeSnapshot, rebuilt in the background when its files change.
+
+    `current` is a plain attribute read; a reload builds the new snapshot off
+    to the side and publishes it with a single reference assignment, so
+    readers never wait and never see a half-built snapshot. A failed rebuild
+    (e.g. a half-written JSON file) keeps serving the previous version.
+    """
+
+    def __init__(self, disease_file=MEDICAL_DISEASE_FILE, rules_file=RULES_FILE, regions_file=BODY_REGIONS_FILE,
+                 knowbase_path=KNOWBASE_DIR):
+        self.files = (disease_file, rules_file, regions_file)
+        self.knowbase_path = knowbase_path
+        base = Path(__file__).parent.parent
+        self._paths = [base / path for path in self.files]
+        self._reload_lock = threading.Lock()
+        self._watcher = None
+        self._file_state = _file_state(self._paths)
+        try:
+            self.current = build_snapshot(*self.files, knowbase_path=knowbase_path)
+        except Exception as e:
+            logger.error(f"Failed to load medical disease data: {str(e)}")
+            self.current = KnowledgeSnapshot("empty", {}, ReasoningRules([]), None, BodyRegionTable({}), sources=())
+        logger.info(f"Knowledge snapshot {self.current.version}: {len(self.current)} diseases, "
+                    f"{len(self.current.rules)} rules")
+
+    def reload(self, force=False):
+        """Rebuild and publish a new snapshot if the files changed; returns True when swapped"""
+        with self._reload_lock:
+            state = _file_state(self._paths)
+            if state == self._file_state and not force:
+                return False
+            # Retried on the next change to the files, not on every poll
+            self._file_state = state
+            try:
+                snapshot = build_snapshot(*self.files, knowbase_path=self.knowbase_path)
+            except Exception as e:
+                logger.error(f"Knowledge reload failed, keeping snapshot {self.current.version}: {e}")
+                return False
+            if snapshot.version == self.current.version:
+                return False
+            previous = self.current
+            self.current = snapshot
+            logger.info(f"Knowledge snapshot {previous.version} -> {snapshot.version}: "
+                        f"{len(snapshot)} diseases, {len(snapshot.rules)} rules")
+            return True
+
+    def watch(self, interval_s=KNOWLEDGE_RELOAD_INTERVAL_S):
+        """Start the background thread that polls the data files and reloads on change"""
+        if interval_s <= 0 or self._watcher is not None:
+            return self
+
+        def run():
+            while True:
+                time.sleep(interval_s)
+                self.reload()
+
+        self._watcher = threading.Thread(target=run, name="knowledge-reload", daemon=True)
+        self._watcher.start()
+        return self
+
+
+knowledge = KnowledgeBase()
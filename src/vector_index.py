@@ -0,0 +1,353 @@
+#this file is src/vector_index.py
+import json
+import logging
+import math
+import os
+from pathlib import Path
+
+import numpy as np
+from langchain_core.documents import Document
+from langchain_core.vectorstores import VectorStore
+
+from src.knowbase import Knowbase, KNOWBASE_DIR
+
+logger = logging.getLogger(__name__)
+
+# flat (exact), hnsw/ivf (built by store_index.py --ann) or int8/pq (built by
+# store_index.py --quantize)
+VECTOR_INDEX = os.environ.get("VECTOR_INDEX", "flat")
+HNSW_EF_SEARCH = int(os.environ.get("HNSW_EF_SEARCH", 64))
+IVF_NPROBE = int(os.environ.get("IVF_NPROBE", 16))
+# quantized indexes re-rank k * RERANK_FACTOR candidates with the float vectors,
+# when the knowledge base kept them (store_index.py --quantize ... --rerank)
+RERANK_FACTOR = int(os.environ.get("RERANK_FACTOR", 10))
+ADD_BATCH = 10000
+SCORE_BLOCK = 65536
+
+
+def normalize(vectors):
+    """L2-normalize rows (or a single vector) so dot products are cosine similarities"""
+    vectors = np.asarray(vectors, dtype=np.float32)
+    norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+    return vectors / np.maximum(norms, 1e-12)
+
+
+def top_k(scores, k):
+    """Indices of the k highest scores, best first, without a full sort"""
+    k = min(k, len(scores))
+    if k <= 0:
+        return np.empty(0, dtype=np.int64)
+    candidates = np.argpartition(-scores, k - 1)[:k]
+    return candidates[np.argsort(-scores[candidates], kind="stable")]
+
+
+class FlatIndex:
+    """Exact cosine search over a matrix of normalized vectors.
+
+    For a few thousand 384-d chunks one matrix-vector product is well under a
+    millisecond, so there is nothing to gain from an approximate index.
+    """
+
+    def __init__(self, vectors):
+        self.vectors = vectors
+
+    def __len__(self):
+        return len(self.vectors)
+
+    def search(self, query, k=3):
+        """Return (rows, cosine scores) of the k nearest vectors"""
+        if len(self.vectors) == 0:
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float32)
+        scores = self.vectors @ normalize(query)
+        rows = top_k(scores, k)
+        return rows, scores[rows]
+
+
+class ANNIndex:
+    """Approximate nearest neighbour search (faiss HNSW or IVF) for large corpora.
+
+    Vectors are unit-length, so inner product is cosine similarity. Recall is
+    traded against latency at query time through ef_search (HNSW: size of the
+    candidate list) or nprobe (IVF: number of inverted lists scanned).
+    """
+
+    def __init__(self, faiss_index, kind, ef_search=HNSW_EF_SEARCH, nprobe=IVF_NPROBE):
+        self.faiss_index = faiss_index
+        self.kind = kind
+        self.set_search_params(ef_search=ef_search, nprobe=nprobe)
+
+    def __len__(self):
+        return self.faiss_index.ntotal
+
+    def set_search_params(self, ef_search=None, nprobe=None):
+        if self.kind == "hnsw" and ef_search:
+            self.faiss_index.hnsw.efSearch = ef_search
+        elif self.kind == "ivf" and nprobe:
+            self.faiss_index.nprobe = nprobe
+
+    def search(self, query, k=3):
+        scores, rows = self.faiss_index.search(normalize(query).reshape(1, -1), k)
+        found = rows[0] >= 0
+        return rows[0][found].astype(np.int64), scores[0][found]
+
+
+def ann_index_path(knowbase_path, kind):
+    return Path(knowbase_path) / f"ann_{kind}.faiss"
+
+
+def _write_params(path, knowbase, params):
+    """Stamp a derived index file with the knowledge base build it was made from"""
+    params = {**params, "build_id": knowbase.manifest["build_id"]}
+    with open(Path(path).with_suffix(".json"), "w", encoding="utf-8") as f:
+        json.dump(params, f, indent=2)
+
+
+def _read_params(path, knowbase):
+    with open(Path(path).with_suffix(".json"), encoding="utf-8") as f:
+        params = json.load(f)
+    if params.get("build_id") != knowbase.manifest["build_id"]:
+        raise ValueError(f"{path} was built for knowledge base {params.get('build_id')}")
+    return params
+
+
+def build_ann_index(knowbase, kind="hnsw", hnsw_m=32, ef_construction=200, nlist=None):
+    """Build an HNSW or IVF index over the knowledge base vectors and save it next to them.
+
+    Returns None for an empty knowledge base, which has nothing to index.
+    """
+    import faiss
+
+    vectors = knowbase.vectors
+    dimension = knowbase.dimension
+    if not len(vectors):
+        logger.warning(f"Knowledge base is empty, no {kind} index built")
+        return None
+    params = {"kind": kind}
+
+    if kind == "hnsw":
+        index = faiss.IndexHNSWFlat(dimension, hnsw_m, faiss.METRIC_INNER_PRODUCT)
+        index.hnsw.efConstruction = ef_construction
+        params.update(hnsw_m=hnsw_m, ef_construction=ef_construction)
+    elif kind == "ivf":
+        nlist = min(nlist or max(1, int(4 * math.sqrt(len(vectors)))), len(vectors))
+        quantizer = faiss.IndexFlatIP(dimension)
+        index = faiss.IndexIVFFlat(quantizer, dimension, nlist, faiss.METRIC_INNER_PRODUCT)
+        sample = np.random.default_rng(0).choice(len(vectors), size=min(len(vectors), nlist * 64), replace=False)
+        index.train(np.ascontiguousarray(vectors[np.sort(sample)]))
+        params.update(nlist=nlist)
+    else:
+        raise ValueError(f"Unknown ANN index kind: {kind}")
+
+    for start in range(0, len(vectors), ADD_BATCH):
+        index.add(np.ascontiguousarray(vectors[start:start + ADD_BATCH]))
+
+    path = ann_index_path(knowbase.path, kind)
+    faiss.write_index(index, str(path))
+    _write_params(path, knowbase, params)
+    logger.info(f"Built {kind} index over {index.ntotal} vectors at {path}")
+    return ANNIndex(index, kind)
+
+
+class QuantizedIndex:
+    """Compressed vectors (int8 or product quantization) with float re-ranking.
+
+    int8 keeps one signed byte per dimension with a per-dimension scale (4x
+    smaller than float32); PQ keeps pq_m codes per vector (16x at the
+    default 96 for 384-d). With the float vectors kept, the codes pick
+    k * rerank_factor candidates, which are then re-scored exactly; only
+    those rows of the float matrix are read, but the matrix stays on disk
+    next to the codes. Without them (vectors=None) the approximate scores
+    are the answer: the artifact shrinks by the full float matrix at some
+    cost in ranking precision.
+    """
+
+    def __init__(self, vectors, kind, codes=None, scales=None, pq_index=None, rerank_factor=RERANK_FACTOR):
+        self.vectors = vectors
+        self.kind = kind
+        self.codes = codes
+        self.scales = scales
+        self.pq_index = pq_index
+        self.rerank_factor = rerank_factor
+
+    def __len__(self):
+        return len(self.codes) if self.codes is not None else self.pq_index.ntotal
+
+    def _approximate_scores(self, query):
+        if self.kind == "pq":
+            return None
+        scaled = query * self.scales
+        scores = np.empty(len(self.codes), dtype=np.float32)
+        for start in range(0, len(self.codes), SCORE_BLOCK):
+            block = self.codes[start:start + SCORE_BLOCK]
+            scores[start:start + len(block)] = block.astype(np.float32) @ scaled
+        return scores
+
+    def search(self, query, k=3):
+        if len(self) == 0:
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float32)
+        query = normalize(query)
+        rerank = self.vectors is not None
+        n_candidates = min(len(self), k * self.rerank_factor if rerank else k)
+
+        if self.kind == "pq":
+            approximate, candidates = self.pq_index.search(query.reshape(1, -1), n_candidates)
+            found = candidates[0] >= 0
+            approximate, candidates = approximate[0][found], candidates[0][found]
+        else:
+            scores = self._approximate_scores(query)
+            candidates = top_k(scores, n_candidates)
+            approximate = scores[candidates]
+        if not rerank:
+            return candidates.astype(np.int64), approximate
+
+        candidates = np.sort(candidates)
+        exact = np.asarray(self.vectors[candidates]) @ query
+        best = top_k(exact, k)
+        return candidates[best].astype(np.int64), exact[best]
+
+
+def quantized_index_path(knowbase_path, kind):
+    return Path(knowbase_path) / (f"quant_{kind}.faiss" if kind == "pq" else f"quant_{kind}.codes")
+
+
+def build_quantized_index(knowbase, kind="int8", pq_m=96):
+    """Write int8 or PQ codes for the knowledge base vectors next to them.
+
+    PQ codebooks need 2**nbits training vectors per sub-quantizer, so small
+    corpora get fewer bits per code (down to 1 bit at 2 vectors). Returns
+    None, writing nothing, when there are too few vectors to quantize.
+    """
+    vectors = knowbase.vectors
+    path = quantized_index_path(knowbase.path, kind)
+    if len(vectors) < (2 if kind == "pq" else 1):
+        logger.warning(f"Too few vectors ({len(vectors)}) for {kind} codes, none built")
+        return None
+
+    if kind == "int8":
+        scales = np.zeros(knowbase.dimension, dtype=np.float32)
+        for start in range(0, len(vectors), ADD_BATCH):
+            scales = np.maximum(scales, np.abs(vectors[start:start + ADD_BATCH]).max(axis=0))
+        scales = np.maximum(scales, 1e-12) / 127.0
+        with open(path, "wb") as f:
+            for start in range(0, len(vectors), ADD_BATCH):
+                block = np.rint(vectors[start:start + ADD_BATCH] / scales)
+                f.write(np.clip(block, -127, 127).astype(np.int8).tobytes())
+        _write_params(path, knowbase, {"kind": kind, "scales": scales.tolist()})
+    elif kind == "pq":
+        import faiss
+
+        nbits = min(8, int(math.log2(len(vectors))))
+        index = faiss.IndexPQ(knowbase.dimension, pq_m, nbits, faiss.METRIC_INNER_PRODUCT)
+        sample = np.random.default_rng(0).choice(len(vectors), size=min(len(vectors), 256 * 100), replace=False)
+        index.train(np.ascontiguousarray(vectors[np.sort(sample)]))
+        for start in range(0, len(vectors), ADD_BATCH):
+            index.add(np.ascontiguousarray(vectors[start:start + ADD_BATCH]))
+        faiss.write_index(index, str(path))
+        _write_params(path, knowbase, {"kind": kind, "pq_m": pq_m, "nbits": nbits})
+    else:
+        raise ValueError(f"Unknown quantization: {kind}")
+
+    logger.info(f"Built {kind} codes for {len(vectors)} vectors at {path}")
+    return path
+
+
+def _load_quantized_index(knowbase, kind, rerank_factor=RERANK_FACTOR):
+    path = quantized_index_path(knowbase.path, kind)
+    params = _read_params(path, knowbase)
+    if kind == "pq":
+        import faiss
+
+        return QuantizedIndex(knowbase.vectors, kind, pq_index=faiss.read_index(str(path)),
+                              rerank_factor=rerank_factor)
+    codes = np.memmap(path, dtype=np.int8, mode="r", shape=(knowbase.count, knowbase.dimension))
+    return QuantizedIndex(knowbase.vectors, kind, codes=codes,
+                          scales=np.asarray(params["scales"], dtype=np.float32), rerank_factor=rerank_factor)
+
+
+def load_index(knowbase, kind=VECTOR_INDEX, ef_search=HNSW_EF_SEARCH, nprobe=IVF_NPROBE):
+    """Open the configured index over a knowledge base, falling back to exact search"""
+    if knowbase.vectors is None:
+        # Floats dropped at build time: the codes are all there is to search
+        quantized = knowbase.manifest.get("quantized")
+        if kind != quantized:
+            logger.warning(f"Knowledge base keeps only {quantized} codes, serving those instead of {kind}")
+        return _load_quantized_index(knowbase, quantized)
+
+    if kind == "flat":
+        return FlatIndex(knowbase.vectors)
+
+    try:
+        if kind in ("int8", "pq"):
+            index = _load_quantized_index(knowbase, kind)
+        else:
+            import faiss
+
+            path = ann_index_path(knowbase.path, kind)
+            _read_params(path, knowbase)
+            # IVF lists can be served straight from the page cache
+            flags = faiss.IO_FLAG_MMAP if kind == "ivf" else 0
+            index = ANNIndex(faiss.read_index(str(path), flags), kind, ef_search=ef_search, nprobe=nprobe)
+        logger.info(f"Loaded {kind} index with {len(index)} vectors")
+        return index
+    except Exception as e:
+        option = "--quantize" if kind in ("int8", "pq") else "--ann"
+        logger.warning(f"{kind} index unavailable ({e}), using exact search; "
+                       f"rebuild it with `python store_index.py {option} {kind}`")
+        return FlatIndex(knowbase.vectors)
+
+
+class LocalVectorStore(VectorStore):
+    """Read-only LangChain vector store over the memory-mapped knowledge base.
+
+    Drop-in replacement for PineconeVectorStore/FAISS: `as_retriever(...)`
+    works unchanged, but search runs in-process with no network hop, exact by
+    default, through an ANN index (VECTOR_INDEX=hnsw|ivf) or over compressed
+    codes (VECTOR_INDEX=int8|pq), re-ranked with the float vectors when the
+    build kept them. The store is
+    built by store_index.py, so add_texts is not supported.
+    """
+
+    def __init__(self, knowbase, embedding, index=None):
+        self.knowbase = knowbase
+        self.embedding = embedding
+        self.index = index if index is not None else load_index(knowbase)
+
+    @classmethod
+    def load(cls, embedding, path=KNOWBASE_DIR, kind=VECTOR_INDEX):
+        knowbase = Knowbase(path)
+        if getattr(embedding, "model_name", knowbase.model_name) != knowbase.model_name:
+            logger.warning(f"Knowledge base was embedded with {knowbase.model_name}, "
+                           f"queries use {embedding.model_name}")
+        return cls(knowbase, embedding, load_index(knowbase, kind))
+
+    @property
+    def embeddings(self):
+        return self.embedding
+
+    def _document(self, row):
+        chunk = self.knowbase.chunk(int(row))
+        return Document(page_content=chunk["text"], metadata={**chunk["metadata"], "id": chunk["id"]})
+
+    def similarity_search_by_vector_with_score(self, embedding, k=4):
+        rows, scores = self.index.search(np.asarray(embedding, dtype=np.float32), k)
+        return [(self._document(row), float(score)) for row, score in zip(rows, scores)]
+
+    def similarity_search_by_vector(self, embedding, k=4, **kwargs):
+        return [doc for doc, _ in self.similarity_search_by_vector_with_score(embedding, k)]
+
+    def similarity_search_with_score(self, query, k=4, **kwargs):
+        return self.similarity_search_by_vector_with_score(self.embedding.embed_query(query), k)
+
+    def similarity_search(self, query, k=4, **kwargs):
+        return [doc for doc, _ in self.similarity_search_with_score(query, k)]
+
+    def _select_relevance_score_fn(self):
+        # Cosine similarity in [-1, 1] mapped onto [0, 1]
+        return lambda score: (score + 1.0) / 2.0
+
+    def add_texts(self, texts, metadatas=None, **kwargs):
+        raise TypeError("LocalVectorStore is read-only; rebuild via store_index.py")
+
+    @classmethod
+    def from_texts(cls, texts, embedding, metadatas=None, **kwargs):
+        raise TypeError("LocalVectorStore is read-only; rebuild via store_index.py")
@@ -486,25 +486,12 @@ document.addEventListener('DOMContentLoaded', function() {
                         'EDI is processing...');
         
         try {
-            const response = await fetch('/get', {
-                method: 'POST',
-                headers: { 'Content-Type': 'application/json' },
-                body: JSON.stringify({ 
-                    msg: message,
-                    lang: currentLanguage,
-                    session_id: sessionStorage.getItem('session_id') || 'default'
-                })
+            const data = await streamChat({ 
+                msg: message,
+                lang: currentLanguage,
+                session_id: sessionStorage.getItem('session_id') || 'default'
             });
             
-            const data = await response.json();
-            
-            if (!response.ok) {
-                throw new Error(data.error || "Request failed");
-            }
-            
-            const formattedResponse = formatAIResponse(data.answer);
-            addMessage(formattedResponse, 'receive');
-            
             if (data.session_id) {
                 sessionStorage.setItem('session_id', data.session_id);
             }
@@ -714,25 +701,11 @@ document.addEventListener('DOMContentLoaded', function() {
                         currentLanguage === 'nr' ? 'EDI iyacabanga...' : '');
         
         try {
-            const response = await fetch('/get', {
-                method: 'POST',
-                headers: { 'Content-Type': 'application/json' },
-                body: JSON.stringify({ 
-                    msg: message,
-                    lang: currentLanguage 
-                })
+            await streamChat({ 
+                msg: message,
+                lang: currentLanguage 
             });
             
-            const data = await response.json();
-            
-            if (!response.ok) {
-                throw new Error(data.error || "Request failed");
-            }
-            
-            // Process the response to format disease information, clinics, etc.
-            const formattedResponse = formatAIResponse(data.answer);
-            addMessage(formattedResponse, 'receive');
-            
             // If chat is closed, show notification
             if (!chatBox.classList.contains('active')) {
                 document.querySelector('.notification-badge').style.display = 'flex';
@@ -746,6 +719,83 @@ document.addEventListener('DOMContentLoaded', function() {
         }
     }
     
+    // Ask /get_stream and render its events into one message as they arrive: the
+    // acknowledgement, urgency banner and disease card show before the model has
+    // produced anything, then tokens are appended until `done` replaces them with
+    // the final formatted answer. Resolves with the `done` payload.
+    async function streamChat(payload) {
+        const response = await fetch('/get_stream', {
+            method: 'POST',
+            headers: { 'Content-Type': 'application/json' },
+            body: JSON.stringify(payload)
+        });
+        
+        if (!response.ok || !response.body) {
+            const data = await response.json().catch(() => ({}));
+            throw new Error(data.error || "Request failed");
+        }
+        
+        const reader = response.body.getReader();
+        const decoder = new TextDecoder();
+        let buffer = '';
+        let message = null;
+        let tokens = null;
+        let result = null;
+        
+        const content = () => {
+            if (!message) {
+                removeTypingIndicator();
+                message = addMessage('', 'receive');
+            }
+            return message;
+        };
+        
+        const handle = (event, data) => {
+            if (event === 'ack') {
+                content().insertAdjacentHTML('beforeend', `<div>${formatAIResponse(data.text)}</div>`);
+            } else if (event === 'urgency') {
+                content().insertAdjacentHTML('beforeend', `<div class="disease-urgent">${formatAIResponse(data.text)}</div>`);
+            } else if (event === 'card') {
+                content().insertAdjacentHTML('beforeend', `<div class="disease-card">${formatAIResponse(data.text)}</div>`);
+            } else if (event === 'token') {
+                // Provisional model text, shown as plain text until `done` brings the formatted answer
+                if (!tokens) {
+                    tokens = content().appendChild(document.createTextNode(''));
+                }
+                tokens.appendData(data.text);
+            } else if (event === 'done' || event === 'error') {
+                // Rendered exactly as a /get answer is
+                content().innerHTML = formatAIResponse(data.answer || '');
+                result = data;
+            }
+            chatMessages.scrollTop = chatMessages.scrollHeight;
+        };
+        
+        while (true) {
+            const { value, done } = await reader.read();
+            if (done) break;
+            buffer += decoder.decode(value, { stream: true });
+            
+            let boundary;
+            while ((boundary = buffer.indexOf('\n\n')) !== -1) {
+                const block = buffer.slice(0, boundary);
+                buffer = buffer.slice(boundary + 2);
+                let event = 'message';
+                let data = '';
+                block.split('\n').forEach(line => {
+                    if (line.startsWith('event:')) event = line.slice(6).trim();
+                    else if (line.startsWith('data:')) data += line.slice(5).trim();
+                });
+                if (data) handle(event, JSON.parse(data));
+            }
+        }
+        
+        if (!result) {
+            throw new Error("Stream ended early");
+        }
+        return result;
+    }
+    
     // Format the AI response to handle structured data
     function formatAIResponse(response) {
         // Check if response contains disease information markers
@@ -808,6 +858,7 @@ document.addEventListener('DOMContentLoaded', function() {
         
         chatMessages.appendChild(messageDiv);
         chatMessages.scrollTop = chatMessages.scrollHeight;
+        return messageDiv.querySelector('p');
     }
     
     function generatePrintableSummary() {
@@ -1,60 +1,271 @@
 #this file is store_index.py
-from src.helper import load_pdf_file, text_split, download_huggingface_embeddings
+# Build step: parse the PDFs in Data/, embed the chunks once and write the
+# full_medical_knowbase artifact that app.py memory-maps at startup.
+# Run it with `python store_index.py` whenever the source documents change;
+# only new or changed PDFs/chunks are parsed and embedded again.
+from src.helper import (iter_pdf_chunks, batched, list_pdf_files, file_sha256, chunk_ids,
+                        download_huggingface_embeddings)
+from src.knowbase import Knowbase, KnowbaseWriter, load_knowbase, drop_float_vectors, KNOWBASE_DIR
+from src.lexical_index import build_lexical_index
+from src.fuzzy import build_guard_words
+from src.vector_index import build_ann_index, build_quantized_index
 from pinecone import Pinecone, ServerlessSpec
-from langchain_pinecone import PineconeVectorStore
 from tqdm.auto import tqdm
+import numpy as np
+import argparse
+import json
+from itertools import groupby
+from operator import itemgetter
 import time
 import os
+from pathlib import Path
 from dotenv import load_dotenv
 
 load_dotenv()
 
-# Initialize Pinecone
 PINECONE_API_KEY = os.environ.get("PINECONE_API_KEY")
-os.environ["PINECONE_API_KEY"] = PINECONE_API_KEY
 
+index_name = "medicalbot"
+namespace = "medical_knowledge"
+dimension = 384
+batch_size = 100
+PINECONE_STATE_FILE = "pinecone.json"
 
-extracted_data = load_pdf_file(data_path="Data/")
-text_chunks = text_split(extracted_data)
-embeddings = download_huggingface_embeddings()
 
-pc = Pinecone(api_key=PINECONE_API_KEY)
+def build_knowbase(data_path="Data/", output_path=KNOWBASE_DIR, full_rebuild=False, workers=None):
+    """Parse, split and embed the corpus into the on-disk knowledge base.
+
+    The manifest records a content hash per source PDF and the content-hashed
+    ids of its chunks. Unchanged PDFs are copied over from the previous build
+    without parsing, and inside a changed PDF only chunks with a new hash are
+    embedded. Changed PDFs are parsed and split on `workers` processes.
+    Returns (manifest, added_ids, removed_ids).
+
+    Everything streams: page ranges -> chunk batches -> embedding batches ->
+    artifact files on disk, so memory stays bounded by the in-flight page
+    ranges and one batch regardless of corpus size.
+
+    A previous build that kept only quantized codes has no vectors to copy;
+    its chunks are re-embedded through the persistent embedding cache,
+    which still holds every float vector, so nothing is recomputed.
+    """
+    embeddings = download_huggingface_embeddings()
+
+    previous = load_knowbase(output_path)
+    previous_ids = set(previous.row_ids()) if previous is not None else set()
+    # Pinecone only needs a diff if it was in sync with the previous build
+    in_sync = previous is not None and _read_pinecone_state(previous.path) == previous.manifest["build_id"]
+
+    if previous is not None and previous.model_name != embeddings.model_name:
+        print(f"Embedding model changed ({previous.model_name} -> {embeddings.model_name}), rebuilding everything")
+        full_rebuild = True
+
+    previous_sources = previous.manifest.get("sources", {}) if previous is not None and not full_rebuild else {}
+    previous_rows = previous.row_ids() if previous is not None and not full_rebuild else {}
+
+    writer = KnowbaseWriter(output_path, model_name=embeddings.model_name, dimension=dimension)
+    sources = {}
+    current_ids = set()
+    reparsed_ids = set()
+    reused = embedded = 0
+
+    pdf_paths = list_pdf_files(data_path)
+    digests = {pdf_path: file_sha256(pdf_path) for pdf_path in pdf_paths}
+
+    def unchanged(pdf_path):
+        old = previous_sources.get(pdf_path)
+        return bool(old) and old["sha256"] == digests[pdf_path] and all(cid in previous_rows for cid in old["chunks"])
+
+    changed = iter_pdf_chunks([p for p in pdf_paths if not unchanged(p)], workers=workers)
+    parsed = groupby(changed, key=itemgetter(0))
+
+    try:
+        for pdf_path in tqdm(pdf_paths, desc="Indexing PDFs"):
+            if unchanged(pdf_path):
+                old = previous_sources[pdf_path]
+                for ids in batched(old["chunks"], batch_size):
+                    rows = [previous_rows[cid] for cid in ids]
+                    records = [previous.chunk(r) for r in rows]
+                    texts = [r["text"] for r in records]
+                    vectors = (previous.vectors[rows] if previous.vectors is not None
+                               else embeddings.embed_documents(texts))
+                    writer.add(texts, [r["metadata"] for r in records], vectors, ids=ids)
+                    reused += len(rows)
+                sources[pdf_path] = old
+                current_ids.update(old["chunks"])
+                continue
+
+            # iter_pdf_chunks yields the changed PDFs in the same order
+            _, page_ranges = next(parsed)
+            text_chunks = (chunk for _, chunks in page_ranges for chunk in chunks)
+            seen = {}
+            file_ids = []
+
+            for batch in batched(text_chunks, batch_size):
+                ids = chunk_ids(batch, seen)
+                texts = [chunk.page_content for chunk in batch]
+                vectors = np.empty((len(batch), dimension), dtype=np.float32)
+
+                missing = []
+                for i, cid in enumerate(ids):
+                    if cid in previous_rows and previous.vectors is not None:
+                        vectors[i] = previous.vectors[previous_rows[cid]]
+                        reused += 1
+                    else:
+                        missing.append(i)
+                if missing:
+                    vectors[missing] = embeddings.embed_documents([texts[i] for i in missing])
+                    embedded += len(missing)
+
+                writer.add(texts, [chunk.metadata for chunk in batch], vectors, ids=ids)
+                file_ids.extend(ids)
+
+            sources[pdf_path] = {"sha256": digests[pdf_path], "chunks": file_ids}
+            current_ids.update(file_ids)
+            reparsed_ids.update(file_ids)
+
+        manifest = writer.commit(extra={"sources": sources})
+    except Exception:
+        writer.abort()
+        raise
+    finally:
+        changed.close()
+
+    print(f"Reused {reused} chunk embeddings, embedded {embedded} new chunks")
+
+    # Chunks of re-parsed PDFs are re-upserted even when their vector was
+    # reused, because their page metadata may have moved
+    added = reparsed_ids if in_sync and not full_rebuild else current_ids
+    removed = previous_ids - current_ids
+    return manifest, added, removed
 
-index_name = "medicalbot"
-dimension = 384  
 
+def _read_pinecone_state(knowbase_path):
+    try:
+        with open(Path(knowbase_path) / PINECONE_STATE_FILE, encoding="utf-8") as f:
+            return json.load(f).get("synced_build_id")
+    except (FileNotFoundError, ValueError):
+        return None
 
-if index_name not in pc.list_indexes().names():
-    pc.create_index(
-        name=index_name,
-        dimension=dimension,
-        metric="cosine",
-        spec=ServerlessSpec(
-            cloud="aws",
-            region="us-east-1"
+
+def iter_upsert_batches(knowbase, rows):
+    """Stream Pinecone upsert payloads for the given rows straight from the memory-mapped artifact"""
+    for batch in batched(rows, batch_size):
+        records = []
+        for i in batch:
+            chunk = knowbase.chunk(i)
+            # "text" is the metadata key PineconeVectorStore reads documents back from
+            metadata = {**chunk["metadata"], "text": chunk["text"], "id": chunk["id"]}
+            records.append({"id": chunk["id"], "values": knowbase.vectors[i].tolist(), "metadata": metadata})
+        yield records
+
+
+def stale_pinecone_ids(index, current_ids, removed_ids):
+    """Ids stored in the index that the current build no longer has.
+
+    Taken from the index's own listing, so vectors left behind by an earlier
+    sync that failed or was skipped are found too; indexes that cannot list
+    their ids (pod-based) fall back to the diff against the previous build.
+    """
+    try:
+        stale = set()
+        for ids in index.list(namespace=namespace):
+            stale.update(chunk_id for chunk_id in ids if chunk_id not in current_ids)
+        return stale
+    except Exception as e:
+        print(f"Could not list the ids in {index_name} ({e}), deleting only chunks removed since the last build")
+        return set(removed_ids)
+
+
+def sync_pinecone(added_ids, removed_ids, knowbase_path=KNOWBASE_DIR):
+    """Upsert new chunks and delete every stale one, reusing the prebuilt vectors"""
+    knowbase = Knowbase(knowbase_path)
+    pc = Pinecone(api_key=PINECONE_API_KEY)
+
+    if index_name not in pc.list_indexes().names():
+        pc.create_index(
+            name=index_name,
+            dimension=dimension,
+            metric="cosine",
+            spec=ServerlessSpec(
+                cloud="aws",
+                region="us-east-1"
+            )
         )
-    )
-    print(f"Created new index: {index_name}")
-else:
-    print(f"Index {index_name} already exists")
-
-# Embed each chunk and upsert the embeddings into your Pinecone index
-try:
-    
-    docsearch = PineconeVectorStore.from_documents(
-        documents=text_chunks,
-        embedding=embeddings,
-        index_name=index_name,
-        batch_size=100,
-        namespace="medical_knowledge",
-    )
-    print("Successfully embedded all chunks!")
-    
-except Exception as e:
-    print(f" Embedding failed: {str(e)}")
-    
-    from langchain_community.vectorstores import FAISS
-    faiss_store = FAISS.from_documents(text_chunks, embeddings)
-    faiss_store.save_local("medical_chatbot_fallback")
-    print("Saved embeddings locally as fallback")
+        print(f"Created new index: {index_name}")
+    else:
+        print(f"Index {index_name} already exists")
+
+    index = pc.Index(index_name)
+
+    current_ids = set(knowbase.ids())
+    removed_ids = sorted(stale_pinecone_ids(index, current_ids, removed_ids))
+    for start in range(0, len(removed_ids), 1000):
+        index.delete(ids=removed_ids[start:start + 1000], namespace=namespace)
+
+    rows = [i for i, chunk_id in enumerate(knowbase.ids()) if chunk_id in added_ids]
+    for records in tqdm(iter_upsert_batches(knowbase, rows), total=-(-len(rows) // batch_size),
+                        desc="Upserting to Pinecone"):
+        index.upsert(vectors=records, namespace=namespace)
+
+    # Recorded only after every delete and upsert went through; a failed sync
+    # leaves the state stale, so the next build upserts everything again
+    with open(knowbase.path / PINECONE_STATE_FILE, "w", encoding="utf-8") as f:
+        json.dump({"index": index_name, "namespace": namespace,
+                   "synced_build_id": knowbase.manifest["build_id"]}, f, indent=2)
+    print(f"Pinecone: upserted {len(rows)} chunks, deleted {len(removed_ids)}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build the medical knowledge base")
+    parser.add_argument("--data", default="Data/", help="directory containing the source PDFs")
+    parser.add_argument("--output", default=KNOWBASE_DIR, help="knowledge base artifact directory")
+    parser.add_argument("--full", action="store_true", help="ignore the previous build and re-embed everything")
+    parser.add_argument("--ann", choices=["hnsw", "ivf"], default=None,
+                        help="also build an approximate nearest neighbour index for the local retriever")
+    parser.add_argument("--quantize", choices=["int8", "pq"], default=None,
+                        help="also write compressed vector codes for the local retriever; the float "
+                             "vectors are then deleted from the artifact unless --rerank is given")
+    parser.add_argument("--rerank", action="store_true",
+                        help="with --quantize, keep the float vectors to re-rank candidates exactly: more "
+                             "precise ranking, but the artifact keeps the floats next to the codes")
+    parser.add_argument("--workers", type=int, default=None,
+                        help="processes used to parse PDFs (default: INGEST_WORKERS or all cores)")
+    args = parser.parse_args()
+
+    started = time.time()
+    manifest, added, removed = build_knowbase(args.data, args.output, full_rebuild=args.full, workers=args.workers)
+    print(f"Built knowledge base {manifest['build_id']} with {manifest['count']} chunks")
+
+    knowbase = Knowbase(args.output)
+    build_lexical_index(knowbase)
+    print("Built BM25 lexical index")
+    print(f"Wrote {build_guard_words(args.output)} speller guard words")
+
+    if args.ann and build_ann_index(knowbase, kind=args.ann) is not None:
+        print(f"Built {args.ann} index, serve it with VECTOR_INDEX={args.ann}")
+
+    quantized = args.quantize and build_quantized_index(knowbase, kind=args.quantize) is not None
+    if quantized:
+        print(f"Built {args.quantize} codes, serve them with VECTOR_INDEX={args.quantize}")
+
+    if PINECONE_API_KEY:
+        try:
+            sync_pinecone(added, removed, args.output)
+            print("Pinecone index is up to date!")
+        except Exception as e:
+            print(f" Pinecone sync failed: {str(e)}")
+            print(f"app.py will serve from the local knowledge base in {args.output}")
+    else:
+        print("PINECONE_API_KEY not set, skipping Pinecone upsert")
+
+    # Last: the Pinecone upsert and the codes were built from the floats
+    if quantized and not args.rerank:
+        drop_float_vectors(args.output, args.quantize)
+        print(f"Deleted the float vectors, {args.quantize} codes now serve search (keep them with --rerank)")
+
+    print(f"Done in {time.time() - started:.1f}s")
+
 
+if __name__ == "__main__":
+    main()
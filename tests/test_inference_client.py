@@ -0,0 +1,115 @@
+import json
+import threading
+import time
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+import pytest
+import requests
+
+from src.inference_client import PooledInferenceClient, CircuitBreaker, CircuitOpenError
+
+
+@pytest.fixture
+def stub():
+    """Local inference endpoint answering with whatever status the test sets"""
+    state = {"status": 200, "body": None, "content_type": "application/json"}
+
+    class Handler(BaseHTTPRequestHandler):
+        def log_message(self, *args):
+            pass
+
+        def do_POST(self):
+            self.rfile.read(int(self.headers["Content-Length"]))
+            body = json.dumps([{"generated_text": "ok"}] if state["status"] == 200 else {"error": "x"}).encode()
+            if state["body"] is not None:
+                body = state["body"].encode()
+            self.send_response(state["status"])
+            self.send_header("Content-Type", state["content_type"])
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield f"http://127.0.0.1:{server.server_port}/", state
+    server.shutdown()
+
+
+def test_breaker_opens_and_closes_after_trial(stub):
+    url, state = stub
+    client = PooledInferenceClient(url=url, breaker=CircuitBreaker(failure_threshold=2, reset_s=0.05))
+    state["status"] = 503
+    for _ in range(2):
+        with pytest.raises(requests.HTTPError):
+            client.text_generation("x")
+    assert client.breaker.state == "open"
+    with pytest.raises(CircuitOpenError):
+        client.text_generation("x")
+
+    time.sleep(0.06)
+    state["status"] = 200
+    assert client.text_generation("x") == "ok"
+    assert client.breaker.state == "closed"
+
+
+def test_rejected_trial_frees_the_trial_slot(stub):
+    url, state = stub
+    client = PooledInferenceClient(url=url, breaker=CircuitBreaker(failure_threshold=1, reset_s=0.05))
+    state["status"] = 503
+    with pytest.raises(requests.HTTPError):
+        client.text_generation("x")
+    time.sleep(0.06)
+
+    # A 4xx trial says nothing about health: the breaker stays half-open, not stuck
+    state["status"] = 400
+    with pytest.raises(requests.HTTPError):
+        client.text_generation("x")
+    assert client.breaker.state == "half-open"
+
+    state["status"] = 200
+    assert client.text_generation("x") == "ok"
+    assert client.breaker.state == "closed"
+
+
+def test_cancelled_trial_is_released():
+    breaker = CircuitBreaker(failure_threshold=1, reset_s=0)
+    breaker.record_failure()
+    assert breaker.allow()
+    assert not breaker.allow()
+    breaker.settle(KeyboardInterrupt())
+    assert breaker.allow()
+
+
+def sse_body(*tokens):
+    return "".join(f"data: {json.dumps({'token': {'text': text, 'special': special}})}\n\n"
+                   for text, special in tokens)
+
+
+def test_stream_yields_sse_tokens(stub):
+    url, state = stub
+    client = PooledInferenceClient(url=url)
+    state["content_type"] = "text/event-stream"
+    state["body"] = sse_body(("Drink", False), (" water", False), ("</s>", True))
+    assert list(client.stream_generation("x")) == ["Drink", " water"]
+    assert client.breaker.state == "closed"
+
+
+def test_stream_reads_plain_json_answer(stub):
+    url, state = stub
+    client = PooledInferenceClient(url=url)
+    # An endpoint that ignores `stream` answers with the non-streaming body
+    state["body"] = json.dumps([{"generated_text": "Drink water"}])
+    assert list(client.stream_generation("x")) == ["Drink water"]
+
+
+@pytest.mark.parametrize("content_type, body", [
+    ("text/event-stream", sse_body(("</s>", True))),
+    ("application/json", json.dumps([{"generated_text": ""}])),
+])
+def test_empty_stream_is_a_failure(stub, content_type, body):
+    url, state = stub
+    client = PooledInferenceClient(url=url, breaker=CircuitBreaker(failure_threshold=1, reset_s=60))
+    state["content_type"], state["body"] = content_type, body
+    with pytest.raises(RuntimeError):
+        list(client.stream_generation("x"))
+    assert client.breaker.state == "open"
@@ -0,0 +1,35 @@
+import pytest
+
+from src.lexicon import match_lexicons
+from src.matcher import KeywordMatcher
+
+
+@pytest.mark.parametrize("keyword, text", [
+    ("hot", "we stayed at a hotel"),
+    ("hot", "i had a flu shot"),
+    ("cat", "which category is it"),
+    ("pet", "i smelt petrol"),
+])
+def test_keyword_must_be_a_whole_word(keyword, text):
+    assert not KeywordMatcher().add(keyword, keyword).matches(text)
+
+
+def test_keyword_matches_at_word_boundaries():
+    matcher = KeywordMatcher().add("hot", "hot").add("chest pain", "chest pain")
+    assert matcher.matches("i feel hot, chest pain.") == {"hot", "chest pain"}
+
+
+def test_stem_matches_inflections_but_not_mid_word():
+    matcher = KeywordMatcher().add("vomit*", "vomit")
+    assert list(matcher.find("been vomiting all night")) == [(5, 13, "vomit")]
+    assert not matcher.matches("antivomit pills")
+
+
+def test_substring_matcher_ignores_boundaries():
+    assert KeywordMatcher(word_boundary=False).add("cat", "cat").matches("category") == {"cat"}
+
+
+def test_lexicon_hits():
+    hits = match_lexicons("we stayed at a hotel and my cat category form, then feverish and vomiting")
+    assert hits["symptom"] == ["fever", "nausea"]
+    assert hits["activity"] == ["animal"]
@@ -0,0 +1,42 @@
+#this file is triage_batch.py
+import argparse
+import json
+import sys
+import time
+
+from src.batch import read_intake, iter_triage, BATCH_WORKERS, BATCH_TASK_SIZE
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Triage digitized intake forms with analyze_symptoms")
+    parser.add_argument("input", nargs="?", default="-", help="JSON lines or CSV file of intake texts (default: stdin)")
+    parser.add_argument("--output", "-o", default="-", help="JSON lines file for the results (default: stdout)")
+    parser.add_argument("--format", choices=["jsonl", "csv"], default=None,
+                        help="input format (default: from the file extension, else jsonl)")
+    parser.add_argument("--workers", type=int, default=BATCH_WORKERS,
+                        help="analysis processes (default: BATCH_WORKERS or all cores)")
+    parser.add_argument("--task-size", type=int, default=BATCH_TASK_SIZE, help="intake rows per worker task")
+    args = parser.parse_args()
+
+    fmt = args.format or ("csv" if args.input.lower().endswith(".csv") else "jsonl")
+    source = sys.stdin if args.input == "-" else open(args.input, encoding="utf-8", newline="")
+    sink = sys.stdout if args.output == "-" else open(args.output, "w", encoding="utf-8")
+
+    started = time.time()
+    count = errors = 0
+    try:
+        for result in iter_triage(read_intake(source, fmt), workers=args.workers, task_size=args.task_size):
+            sink.write(json.dumps(result) + "\n")
+            count += 1
+            errors += "error" in result
+    finally:
+        if source is not sys.stdin:
+            source.close()
+        if sink is not sys.stdout:
+            sink.close()
+
+    print(f"Triaged {count} records ({errors} errors) in {time.time() - started:.1f}s", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()